@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def test_settings(django_test_environment):
+    """Автотесты идут с теми же настройками, что и `manage.py test`."""
+    from core.test_runner import TEST_SETTINGS
+    from django.test.utils import override_settings
+
+    with override_settings(**TEST_SETTINGS):
+        yield
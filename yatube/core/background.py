@@ -0,0 +1,40 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def run(fn, *args):
+    """Выполняет задачу фонового потока в текущем потоке.
+
+    Ошибка пишется в лог, а не поднимается: поток должен жить дальше.
+    У фонового потока свое соединение с базой, после задачи оно
+    закрывается.
+    """
+    try:
+        fn(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s%r не выполнена',
+                         fn.__qualname__, args)
+    finally:
+        close_old_connections()
+
+
+def submit(fn, *args, pool, workers):
+    """Ставит `run(fn, *args)` в пул потоков `pool`.
+
+    Пул создается при первой задаче с `workers` потоками.
+    """
+    with _executors_lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            executor = _executors[pool] = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix=pool
+            )
+    return executor.submit(run, fn, *args)
@@ -0,0 +1,217 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+from .instrumentation import record_cache
+
+# Ключ общей метки: номер последней инвалидации в любом процессе.
+STAMP_KEY: str = 'tiered:stamp'
+# Журнал инвалидаций: по номеру метки — измененные ключи или None,
+# если очищен весь кэш. Записи живут дольше любого STAMP_INTERVAL.
+LOG_KEY: str = 'tiered:log:{}'
+LOG_TIMEOUT: int = 300
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: локальный LRU в процессе перед общим кэшем.
+
+    `LOCATION` — алиас общего кэша из `settings.CACHES` (memcached,
+    redis; LocMemCache годится только для одного процесса, см.
+    `core.checks`). Инвалидации — `delete`, `incr` версий и `clear` —
+    увеличивают общую метку и пишут измененные ключи в журнал.
+    Процессы сверяют метку не чаще, чем раз в `STAMP_INTERVAL` секунд,
+    и убирают из своего уровня только ключи из журнала; если журнал
+    неполон или отстал больше чем на `LOG_SIZE` записей, уровень
+    очищается целиком.
+
+    Обычные записи (`set`, `add`) метку не трогают: кэш заполняется
+    постоянно. Перезапись живого ключа через `set` другие процессы
+    увидят не позже чем через `LOCAL_TIMEOUT`; то, что должно меняться
+    сразу, меняется сменой версии в ключе, `incr` или `delete`.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 60))
+        self._stamp_interval = float(options.get('STAMP_INTERVAL', 1))
+        self._log_size = int(options.get('LOG_SIZE', 100))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._stamp_checked_at = 0.0
+        self.local_hits = self.shared_hits = self.misses = 0
+
+    @cached_property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _sync_stamp(self):
+        """Убирает из локального уровня ключи, измененные другими."""
+        now = time.monotonic()
+        if now - self._stamp_checked_at < self._stamp_interval:
+            return
+        stamp = self.shared.get(STAMP_KEY)
+        previous = self._stamp
+        keys = None
+        if stamp == previous:
+            keys = ()
+        elif (
+            isinstance(stamp, int) and isinstance(previous, int)
+            and 0 < stamp - previous <= self._log_size
+        ):
+            log_keys = [
+                LOG_KEY.format(number)
+                for number in range(previous + 1, stamp + 1)
+            ]
+            log = self.shared.get_many(log_keys)
+            if len(log) == len(log_keys) and None not in log.values():
+                keys = [key for changed in log.values() for key in changed]
+        with self._lock:
+            self._drop(keys)
+            self._stamp = stamp
+            self._stamp_checked_at = now
+
+    def _drop(self, keys):
+        # Вызывается под `_lock`; None — очистить уровень целиком.
+        if keys is None:
+            self._local.clear()
+            return
+        for key in keys:
+            self._local.pop(key, None)
+
+    def _invalidate(self, keys):
+        """Сообщает всем процессам об измененных ключах (None — о всех)."""
+        try:
+            stamp = self.shared.incr(STAMP_KEY)
+        except ValueError:
+            # Метки нет: новая не продолжает старые, процессы очистятся.
+            stamp = time.time_ns()
+            self.shared.set(STAMP_KEY, stamp, None)
+        self.shared.set(LOG_KEY.format(stamp), keys, LOG_TIMEOUT)
+        with self._lock:
+            self._drop(keys)
+
+    def _count(self, local_hits=0, shared_hits=0, misses=0):
+        with self._lock:
+            self.local_hits += local_hits
+            self.shared_hits += shared_hits
+            self.misses += misses
+        record_cache(hits=local_hits + shared_hits, misses=misses)
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, pickled = entry
+            if expires_at <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+        return pickled
+
+    def _local_set(self, key, value, timeout):
+        ttl = self._local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (time.monotonic() + ttl, pickled)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        self._sync_stamp()
+        pickled = self._local_get(local_key)
+        if pickled is not None:
+            self._count(local_hits=1)
+            return pickle.loads(pickled)
+        value = self.shared.get(key, self, version=version)
+        if value is self:
+            self._count(misses=1)
+            return default
+        self._count(shared_hits=1)
+        self._local_set(local_key, value, DEFAULT_TIMEOUT)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync_stamp()
+        found, missing = {}, []
+        for key in keys:
+            pickled = self._local_get(self._local_key(key, version))
+            if pickled is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(pickled)
+        local_hits = len(found)
+        shared = {}
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            for key, value in shared.items():
+                self._local_set(
+                    self._local_key(key, version), value, DEFAULT_TIMEOUT
+                )
+            found.update(shared)
+        self._count(
+            local_hits=local_hits,
+            shared_hits=len(shared),
+            misses=len(missing) - len(shared),
+        )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(self._local_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.add(key, value, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self._local_key(key, version), value, timeout)
+        return failed
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        self._invalidate([self._local_key(key, version)])
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        self._invalidate([self._local_key(key, version) for key in keys])
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._invalidate([self._local_key(key, version)])
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def clear(self):
+        self.shared.clear()
+        self._invalidate(None)
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCMEM_BACKEND: str = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Общий уровень `TieredCache` не должен жить в памяти процесса.
+
+    С LocMemCache у каждого процесса свой «общий» кэш: инвалидации
+    не доходят до соседей, и они отдают устаревшие страницы. При
+    DEBUG, когда процесс один, это допустимо.
+    """
+    if settings.DEBUG:
+        return []
+    errors = []
+    for alias, params in settings.CACHES.items():
+        if params['BACKEND'] != 'core.cache_backends.TieredCache':
+            continue
+        shared = settings.CACHES.get(params.get('LOCATION'), {})
+        if shared.get('BACKEND') == LOCMEM_BACKEND:
+            errors.append(Warning(
+                f'Общий уровень кэша {alias!r} хранится в памяти процесса.',
+                hint='Задайте CACHE_BACKEND и CACHE_LOCATION: memcached, '
+                     'redis или DatabaseCache.',
+                id='core.W001',
+            ))
+    return errors
@@ -0,0 +1,216 @@
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from django.db.utils import OperationalError
+
+from core.instrumentation import record_db_connect, record_pool_wait
+
+# Ключи OPTIONS, которые читает пул, драйверу они не передаются.
+POOL_OPTIONS = {
+    'POOL_MIN_SIZE': 1,
+    'POOL_MAX_SIZE': 10,
+    'POOL_TIMEOUT': 5.0,
+    'POOL_MAX_AGE': 600.0,
+    'POOL_CHECK': True,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Пул открытых соединений драйвера DB-API, общий для потоков.
+
+    Соединения выдаются последним вернувшимся первым (LIFO), чтобы
+    лишние простаивали и старели. Перед выдачей соединение проверяется
+    запросом `SELECT 1`, а старше `max_age` секунд — закрывается. Если
+    все `max_size` соединений заняты, запрос ждет до `timeout` секунд.
+    Соединение ходит вместе со временем открытия `born`: пул выдает
+    пару `(conn, born)` и принимает ее обратно в `put()`.
+    """
+
+    def __init__(self, min_size, max_size, timeout, max_age, check=True):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.check = check
+        self._idle = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+
+    @property
+    def size(self):
+        """Число открытых соединений, выданных и свободных."""
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def get(self, create):
+        """Пара `(conn, born)`, при нужде соединение откроет `create()`."""
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        try:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise OperationalError(
+                            f'Пул соединений исчерпан: занято {self._size}.'
+                        )
+                    self._condition.wait(remaining)
+                idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    self._size += 1
+        finally:
+            record_pool_wait(time.perf_counter() - started)
+        if idle is not None and self._usable(*idle):
+            return idle
+        if idle is not None:
+            self._close(idle[0])
+        try:
+            opened = self._open(create)
+        except Exception:
+            self._release()
+            raise
+        self._fill(create)
+        return opened
+
+    def _fill(self, create):
+        """Доводит число соединений до `min_size`."""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                opened = self._open(create)
+            except Exception:
+                self._release()
+                return
+            self.put(*opened)
+
+    def _release(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def put(self, conn, born):
+        """Возвращает соединение в пул или закрывает устаревшее."""
+        if self._expired(born):
+            self.discard(conn)
+            return
+        with self._condition:
+            self._idle.append((conn, born))
+            self._condition.notify()
+
+    def discard(self, conn):
+        """Закрывает соединение и освобождает его место в пуле."""
+        self._close(conn)
+        self._release()
+
+    def _open(self, create):
+        started = time.perf_counter()
+        conn = create()
+        record_db_connect(time.perf_counter() - started)
+        return conn, time.monotonic()
+
+    def _expired(self, born):
+        return time.monotonic() - born > self.max_age
+
+    def _usable(self, conn, born):
+        if self._expired(born):
+            return False
+        if not self.check:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def get_pool(alias, options):
+    """Пул базы `alias`, один на процесс."""
+    with _pools_lock:
+        if alias not in _pools:
+            settings = {**POOL_OPTIONS, **options}
+            _pools[alias] = ConnectionPool(
+                min_size=int(settings['POOL_MIN_SIZE']),
+                max_size=int(settings['POOL_MAX_SIZE']),
+                timeout=float(settings['POOL_TIMEOUT']),
+                max_age=float(settings['POOL_MAX_AGE']),
+                check=bool(settings['POOL_CHECK']),
+            )
+        return _pools[alias]
+
+
+class PooledDatabaseWrapperMixin:
+    """Берет соединения бэкенда Django из `ConnectionPool`.
+
+    `close()` в конце запроса не рвет соединение, а возвращает его в
+    пул. Время открытия соединения обертка хранит в `pool_born`. При
+    `POOL_MAX_SIZE = 0` пул выключен, но время открытия соединений все
+    равно попадает в метрики запроса.
+    """
+
+    pool_born = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for key in POOL_OPTIONS:
+            params.pop(key, None)
+        return params
+
+    @property
+    def pool(self):
+        options = {
+            key: value
+            for key, value in self.settings_dict['OPTIONS'].items()
+            if key in POOL_OPTIONS
+        }
+        if int(options.get('POOL_MAX_SIZE', 1)) <= 0:
+            return None
+        return get_pool(self.alias, options)
+
+    def get_new_connection(self, conn_params):
+        create = partial(super().get_new_connection, conn_params)
+        pool = self.pool
+        if pool is None:
+            started = time.perf_counter()
+            conn = create()
+            record_db_connect(time.perf_counter() - started)
+            return conn
+        conn, self.pool_born = pool.get(create)
+        return conn
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        conn = self.connection
+        if self.in_atomic_block:
+            # Соединение останется у обертки до выхода из atomic(),
+            # отдавать его другим потокам нельзя.
+            with self.wrap_database_errors:
+                pool.discard(conn)
+            return
+        try:
+            if not self.autocommit:
+                conn.rollback()
+        except Exception:
+            pool.discard(conn)
+            return
+        pool.put(conn, self.pool_born)
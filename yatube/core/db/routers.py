@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_state = threading.local()
+_lag = {}
+
+
+def replica_lag(alias):
+    """Отставание реплики в секундах, для недоступной — бесконечность.
+
+    Замер кэшируется на `REPLICA_LAG_CHECK_INTERVAL` секунд. Отставание
+    умеет мерить только PostgreSQL, остальные базы считаются догнавшими.
+    """
+    checked_at, lag = _lag.get(alias, (None, None))
+    now = time.monotonic()
+    if checked_at is not None and (
+        now - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL
+    ):
+        return lag
+    lag = 0.0
+    connection = connections[alias]
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT COALESCE(EXTRACT(EPOCH FROM now() - '
+                    'pg_last_xact_replay_timestamp()), 0)'
+                )
+                lag = float(cursor.fetchone()[0])
+        else:
+            connection.ensure_connection()
+    except DatabaseError:
+        lag = float('inf')
+    _lag[alias] = (now, lag)
+    return lag
+
+
+def choose_replica():
+    """Случайная реплика с допустимым отставанием или None."""
+    healthy = [
+        alias for alias in settings.REPLICA_DATABASES
+        if replica_lag(alias) <= settings.REPLICA_MAX_LAG
+    ]
+    return random.choice(healthy) if healthy else None
+
+
+def reset_state():
+    """Сбрасывает состояние маршрутизации перед новым запросом."""
+    _state.replica = None
+    _state.enabled = False
+    _state.wrote = False
+    _state.pinned = False
+
+
+def wrote():
+    """Писал ли текущий запрос в основную базу."""
+    return getattr(_state, 'wrote', False)
+
+
+def pin_primary():
+    """Отправляет остальные чтения текущего запроса на основную базу."""
+    _state.pinned = True
+
+
+@contextmanager
+def replica_reads():
+    """Разрешает чтение с реплики для запросов внутри блока.
+
+    Реплика выбирается один раз на блок. После первой записи чтения
+    возвращаются на основную базу, чтобы видеть свои изменения.
+    """
+    _state.enabled = True
+    try:
+        yield
+    finally:
+        _state.enabled = False
+        _state.replica = None
+
+
+def read_replica(view):
+    """Декоратор view, который только читает: чтения идут на реплику.
+
+    Пока действует закрепление за основной базой после записи (cookie
+    `REPLICA_PIN_COOKIE`), view читает с основной базы.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if is_pinned(request):
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def is_pinned(request):
+    try:
+        until = float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+class ReplicaRouter:
+    """Чтения из `read_replica`-view на реплики, остальное на основную."""
+
+    def db_for_read(self, model, **hints):
+        if (
+            not getattr(_state, 'enabled', False)
+            or wrote()
+            or getattr(_state, 'pinned', False)
+        ):
+            return None
+        if _state.replica is None:
+            _state.replica = choose_replica() or DEFAULT_DB_ALIAS
+        return _state.replica
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и на основной базе.
+        return True
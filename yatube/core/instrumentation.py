@@ -0,0 +1,136 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template.base import Template
+
+_state = threading.local()
+_install_lock = threading.Lock()
+_original_render = None
+
+
+class RequestStats:
+    """Счетчики одного запроса: SQL, рендер шаблонов и кэш.
+
+    Экземпляр сам служит оберткой для `connection.execute_wrapper`.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+        # Время вложенных шаблонов для каждого рендерящегося сейчас.
+        self.render_stack = []
+        # Имя шаблона -> [число рендеров, собственное время в секундах].
+        self.templates = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.pool_wait_seconds = 0.0
+        self.db_connects = 0
+        self.db_connect_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += time.perf_counter() - started
+
+
+def current_stats():
+    """Счетчики запроса текущего потока или None вне `collect()`."""
+    return getattr(_state, 'stats', None)
+
+
+def record_cache(hits=0, misses=0):
+    """Учитывает попадания и промахи кэша в текущем запросе."""
+    stats = current_stats()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+def record_pool_wait(seconds):
+    """Учитывает ожидание соединения из пула в текущем запросе."""
+    stats = current_stats()
+    if stats is not None:
+        stats.pool_wait_seconds += seconds
+
+
+def record_db_connect(seconds):
+    """Учитывает открытие нового соединения с базой."""
+    stats = current_stats()
+    if stats is not None:
+        stats.db_connects += 1
+        stats.db_connect_seconds += seconds
+
+
+def _timed_render(template, context):
+    stats = current_stats()
+    if stats is None:
+        return _original_render(template, context)
+    stats.render_stack.append(0.0)
+    started = time.perf_counter()
+    try:
+        return _original_render(template, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        nested = stats.render_stack.pop()
+        # Вложенные `{% include %}` входят во время внешнего шаблона, а
+        # в разбивку по шаблонам идет только собственное время.
+        if stats.render_stack:
+            stats.render_stack[-1] += elapsed
+        else:
+            stats.render_seconds += elapsed
+        name = template.origin.template_name or '<string>'
+        entry = stats.templates.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed - nested
+
+
+def top_templates(stats, limit=5):
+    """Самые долгие шаблоны запроса: `{имя: собственное время в мс}`."""
+    ranked = sorted(
+        stats.templates.items(), key=lambda item: item[1][1], reverse=True
+    )
+    return {
+        name: round(seconds * 1000, 2)
+        for name, (calls, seconds) in ranked[:limit]
+    }
+
+
+def install_render_timer():
+    """Подменяет `Template.render` один раз на процесс.
+
+    Вне `collect()` обертка сразу зовет исходный метод, поэтому
+    запросы без замера почти ничего не теряют.
+    """
+    global _original_render
+    with _install_lock:
+        if _original_render is None:
+            _original_render = Template.render
+            Template.render = _timed_render
+
+
+@contextmanager
+def collect():
+    """Собирает `RequestStats` для кода внутри блока в этом потоке.
+
+    Вложенный `collect()` отдает уже идущие счетчики внешнего блока.
+    """
+    stats = current_stats()
+    if stats is not None:
+        yield stats
+        return
+    install_render_timer()
+    stats = RequestStats()
+    _state.stats = stats
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            yield stats
+    finally:
+        _state.stats = None
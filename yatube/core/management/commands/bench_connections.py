@@ -0,0 +1,97 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.test import Client, override_settings
+
+from core.db.pool import PooledDatabaseWrapperMixin
+from core.instrumentation import collect
+
+
+def run_requests(urls, requests, threads, host):
+    """Прогоняет запросы в `threads` потоков, вернет замеры запросов."""
+    def worker(numbers):
+        # Тестовый клиент не закрывает соединения в конце запроса, как
+        # это делает обработчик WSGI, поэтому закрываем их сами.
+        client = Client(HTTP_HOST=host)
+        samples = []
+        for number in numbers:
+            with collect() as stats:
+                started = time.perf_counter()
+                client.get(urls[number % len(urls)])
+                close_old_connections()
+                total = time.perf_counter() - started
+            samples.append((
+                total, stats.db_connects, stats.db_connect_seconds,
+                stats.pool_wait_seconds,
+            ))
+        connections.close_all()
+        return samples
+
+    chunks = [range(start, requests, threads) for start in range(threads)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return [
+            sample
+            for samples in executor.map(worker, chunks)
+            for sample in samples
+        ]
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: задержка запросов к страницам с пулом '
+        'соединений и без него.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', action='append', dest='urls',
+            help='Страница для запросов, можно указать несколько раз.',
+        )
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--host', default='localhost')
+
+    # debug_toolbar и DEBUG заслонили бы время соединений.
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if not isinstance(connection, PooledDatabaseWrapperMixin):
+            raise CommandError(
+                'База default открыта без пула, включите DB_POOL=1.'
+            )
+        pool_options = connection.settings_dict['OPTIONS']
+        max_size = pool_options.get('POOL_MAX_SIZE', 10)
+        urls = options['urls'] or ['/']
+        self.stdout.write(
+            f'{"режим":<8} {"среднее":>9} {"p50":>8} {"p95":>8} '
+            f'{"открытий":>9} {"открытие":>9} {"ожидание":>9}'
+        )
+        try:
+            for mode, size in (('без пула', 0), ('пул', max_size)):
+                pool_options['POOL_MAX_SIZE'] = size
+                connections.close_all()
+                samples = run_requests(
+                    urls, options['requests'], options['threads'],
+                    options['host'],
+                )
+                totals, connects, connect_seconds, waits = zip(*samples)
+                self.stdout.write(
+                    f'{mode:<8} '
+                    f'{statistics.mean(totals) * 1000:>9.2f} '
+                    f'{percentile(totals, 0.5) * 1000:>8.2f} '
+                    f'{percentile(totals, 0.95) * 1000:>8.2f} '
+                    f'{sum(connects):>9} '
+                    f'{statistics.mean(connect_seconds) * 1000:>9.3f} '
+                    f'{statistics.mean(waits) * 1000:>9.3f}'
+                )
+        finally:
+            pool_options['POOL_MAX_SIZE'] = max_size
+        self.stdout.write('Время в миллисекундах на запрос.')
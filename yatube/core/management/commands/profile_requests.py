@@ -0,0 +1,66 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from core.profiler import SamplingProfiler
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет запросы к страницам под статистическим профайлером и '
+        'сохраняет collapsed stacks или профиль speedscope.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', action='append', dest='urls',
+            help='Страница для запросов, можно указать несколько раз.',
+        )
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument(
+            '--user', help='Имя пользователя, от которого идут запросы.'
+        )
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument(
+            '--format', choices=('collapsed', 'speedscope'),
+            default='collapsed',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=settings.PROFILER_INTERVAL
+        )
+        parser.add_argument(
+            '--output', help='Файл для профиля, по умолчанию stdout.'
+        )
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST=options['host'])
+        if options['user']:
+            client.force_login(
+                get_user_model().objects.get(username=options['user'])
+            )
+        urls = options['urls'] or ['/']
+        profiler = SamplingProfiler()
+        profiler.start(
+            float('inf'), options['interval'], settings.PROFILER_MAX_OVERHEAD
+        )
+        try:
+            for number in range(options['requests']):
+                client.get(urls[number % len(urls)])
+        finally:
+            profiler.stop()
+        if options['format'] == 'speedscope':
+            output = json.dumps(profiler.speedscope())
+        else:
+            output = profiler.collapsed()
+        if options['output']:
+            with open(options['output'], 'w') as file_:
+                file_.write(output)
+        else:
+            self.stdout.write(output, ending='')
+        self.stderr.write(
+            f'Выборок: {profiler.samples}, накладные расходы: '
+            f'{profiler.overhead:.2%}'
+        )
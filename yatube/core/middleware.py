@@ -0,0 +1,104 @@
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+
+from .db.routers import reset_state, wrote
+from .instrumentation import collect, top_templates
+
+logger = logging.getLogger('yatube.perf')
+
+
+class PerformanceMiddleware:
+    """Замеряет выборку запросов и пишет метрики в лог.
+
+    Для доли `PERF_SAMPLE_RATE` запросов считает время ответа, число и
+    время SQL-запросов, ожидание пула и открытие соединений с базой,
+    время рендера шаблонов и самые долгие из них, попадания и промахи
+    кэша и размер ответа.
+    Метрики уходят строкой JSON в логгер `yatube.perf` и, если включен
+    `PERF_SERVER_TIMING`, в заголовок `Server-Timing` — только для
+    внутренних запросов, см. `is_internal()`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PERF_SAMPLE_RATE:
+            return self.get_response(request)
+        started = time.perf_counter()
+        with collect() as stats:
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_queries': stats.queries,
+            'sql_ms': round(stats.sql_seconds * 1000, 2),
+            'render_ms': round(stats.render_seconds * 1000, 2),
+            'templates_ms': top_templates(stats),
+            'db_pool_wait_ms': round(stats.pool_wait_seconds * 1000, 2),
+            'db_connects': stats.db_connects,
+            'db_connect_ms': round(stats.db_connect_seconds * 1000, 2),
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+            'bytes': (
+                None if response.streaming else len(response.content)
+            ),
+        }
+        logger.info(json.dumps(record, ensure_ascii=False))
+        if settings.PERF_SERVER_TIMING and is_internal(request):
+            response['Server-Timing'] = server_timing(record)
+        return response
+
+
+def is_internal(request):
+    """Запрос с адреса из `INTERNAL_IPS` или от сотрудника сайта."""
+    if request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def server_timing(record):
+    """Значение заголовка `Server-Timing` по метрикам запроса."""
+    return ', '.join((
+        f'db;dur={record["sql_ms"]};desc="{record["sql_queries"]} queries"',
+        f'dbpool;dur={record["db_pool_wait_ms"]}',
+        f'dbconnect;dur={record["db_connect_ms"]}',
+        f'tpl;dur={record["render_ms"]}',
+        f'cache;desc="{record["cache_hits"]} hits, '
+        f'{record["cache_misses"]} misses"',
+        f'total;dur={record["total_ms"]}',
+    ))
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет чтения клиента за основной базой после его записи.
+
+    Если запрос что-то записал, клиент получает cookie, и следующие
+    `REPLICA_PIN_SECONDS` секунд его чтения не идут на реплики, где
+    записи еще может не быть.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_state()
+        response = self.get_response(request)
+        if wrote() and settings.REPLICA_DATABASES:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                str(time.time() + settings.REPLICA_PIN_SECONDS),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
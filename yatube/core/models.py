@@ -1,4 +1,6 @@
 # core/models.py
+from contextlib import contextmanager
+
 from django.db import models
 
 
@@ -13,3 +15,21 @@ class PubDateModel(models.Model):
     class Meta:
         # Это абстрактная модель:
         abstract = True
+
+
+@contextmanager
+def explicit_pub_dates(*model_classes):
+    """Дает задать `pub_date` вручную, несмотря на `auto_now_add`.
+
+    Нужно при загрузке и генерации данных через `bulk_create`.
+    """
+    fields = [
+        model._meta.get_field('pub_date') for model in model_classes
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
@@ -0,0 +1,165 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Самый длинный интервал, до которого профайлер разрежает выборку.
+MAX_INTERVAL: float = 1.0
+# Вершины стеков потоков, которые только ждут: блокировку, событие,
+# очередь или сокет. Пары `(имя файла, функция)`, CPU они не тратят.
+IDLE_FRAMES = frozenset((
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+    ('selectors.py', 'select'),
+    ('socket.py', 'accept'),
+))
+
+
+class SamplingProfiler:
+    """Статистический профайлер на фоновом потоке, только stdlib.
+
+    Раз в `interval` секунд снимает стеки всех потоков процесса через
+    `sys._current_frames()` и считает одинаковые стеки. Потоки, которые
+    только ждут (см. `IDLE_FRAMES`), пропускаются. Время самой
+    выборки меряется; если оно превышает долю `max_overhead` от
+    прошедшего времени, интервал удваивается.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stacks = Counter()
+            self.samples = 0
+            self.busy_seconds = 0.0
+            self.elapsed_seconds = 0.0
+            self.interval = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def overhead(self):
+        """Доля времени, потраченная на выборку стеков."""
+        if not self.elapsed_seconds:
+            return 0.0
+        return self.busy_seconds / self.elapsed_seconds
+
+    def start(self, duration, interval, max_overhead):
+        """Запускает выборку на `duration` секунд, если она не идет."""
+        if self.running:
+            return False
+        self.reset()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(duration, interval, max_overhead),
+            name='sampling-profiler',
+            daemon=True,
+        )
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self.running:
+            self._thread.join()
+
+    def _run(self, duration, interval, max_overhead):
+        own_id = threading.get_ident()
+        started = time.perf_counter()
+        self.interval = interval
+        while not self._stop.wait(self.interval):
+            sample_started = time.perf_counter()
+            stacks = [
+                _collapse(frame)
+                for thread_id, frame in sys._current_frames().items()
+                if thread_id != own_id and not _is_idle(frame)
+            ]
+            now = time.perf_counter()
+            with self._lock:
+                self.stacks.update(stacks)
+                self.samples += 1
+                self.busy_seconds += now - sample_started
+                self.elapsed_seconds = now - started
+            if self.overhead > max_overhead:
+                self.interval = min(self.interval * 2, MAX_INTERVAL)
+            if self.elapsed_seconds >= duration:
+                break
+
+    def collapsed(self):
+        """Стеки в формате collapsed stacks для flamegraph.pl."""
+        with self._lock:
+            stacks = self.stacks.most_common()
+        return ''.join(
+            ';'.join(_frame_name(frame) for frame in stack) + f' {count}\n'
+            for stack, count in stacks
+        )
+
+    def speedscope(self, name='yatube'):
+        """Профиль в формате speedscope (тип `sampled`)."""
+        with self._lock:
+            stacks = self.stacks.most_common()
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in stacks:
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    function, filename, line = frame
+                    frames.append(
+                        {'name': function, 'file': filename, 'line': line}
+                    )
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(count)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'yatube',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': f'{name} pid {os.getpid()}',
+                'unit': 'none',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }],
+        }
+
+
+def _is_idle(frame):
+    """Стоит ли поток с вершиной стека `frame` в ожидании."""
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def _collapse(frame):
+    """Стек кадра от корня к вершине как кортеж `(функция, файл, строка)`."""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _frame_name(frame):
+    function, filename, line = frame
+    return f'{function} ({filename}:{line})'
+
+
+# Профайлер этого процесса, им управляют страница и команда.
+profiler = SamplingProfiler()
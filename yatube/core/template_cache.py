@@ -0,0 +1,56 @@
+import logging
+import os
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# Какие файлы каталогов шаблонов компилировать заранее.
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+
+
+def _loaders(loaders):
+    for loader in loaders:
+        # У кэширующего загрузчика свои загрузчики внутри.
+        yield from _loaders(getattr(loader, 'loaders', ()))
+        if hasattr(loader, 'get_dirs'):
+            yield loader
+
+
+def template_names(engine):
+    """Имена всех шаблонов, которые видят загрузчики движка."""
+    names = set()
+    for loader in _loaders(engine.template_loaders):
+        for directory in loader.get_dirs():
+            for root, dirs, files in os.walk(directory):
+                for file_name in files:
+                    if file_name.endswith(TEMPLATE_EXTENSIONS):
+                        path = os.path.join(root, file_name)
+                        names.add(os.path.relpath(path, directory))
+    return sorted(names)
+
+
+def warm_templates():
+    """Компилирует все шаблоны в кэш загрузчика, вернет их число.
+
+    Вызывается при старте воркера, чтобы разбор шаблонов не доставался
+    первым запросам. Без `TEMPLATE_CACHE` скомпилированные шаблоны
+    никто не хранит, и функция ничего не делает.
+    """
+    if not settings.TEMPLATE_CACHE:
+        return 0
+    warmed = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in template_names(backend.engine):
+            try:
+                backend.engine.get_template(name)
+            except TemplateSyntaxError:
+                # Например, шаблон библиотеки, которая не установлена.
+                logger.debug('Шаблон %s не скомпилирован', name)
+                continue
+            warmed += 1
+    return warmed
@@ -6,3 +6,11 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.filter
+def page_window(page, size=5):
+    """Номера страниц вокруг текущей вместо полного списка страниц."""
+    first = max(page.number - size, 1)
+    last = min(page.number + size, page.paginator.num_pages)
+    return range(first, last + 1)
@@ -0,0 +1,25 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Настройки на время тестов. Фоновые потоки миниатюр, очереди
+# комментариев и догрузки лент гонятся с очисткой базы между тестами,
+# а случайная выборка замеров делает ответы недетерминированными.
+TEST_SETTINGS = {
+    'THUMBNAIL_ASYNC': False,
+    'COMMENT_FLUSH_ASYNC': False,
+    'TIMELINE_ASYNC': False,
+    'PERF_SAMPLE_RATE': 0,
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты проекта с настройками `TEST_SETTINGS`."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**TEST_SETTINGS)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
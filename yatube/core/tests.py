@@ -0,0 +1,414 @@
+# core/tests.py
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from django.db.utils import OperationalError, load_backend
+from django.template import engines
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from posts.models import Post
+from posts.search import get_backend
+
+from .background import run, submit
+from .cache_backends import TieredCache
+from .checks import check_shared_cache
+from .db.pool import ConnectionPool
+from .db.routers import replica_reads, reset_state
+from .instrumentation import collect
+from .profiler import SamplingProfiler, profiler
+from .template_cache import template_names, warm_templates
+
+
+class TieredCacheTest(SimpleTestCase):
+    """Проверяем двухуровневый кэш на двух «процессах»."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        params = {'OPTIONS': {'STAMP_INTERVAL': 0, 'LOCAL_MAX_ENTRIES': 2}}
+        self.worker_one = TieredCache('shared', params)
+        self.worker_two = TieredCache('shared', params)
+        # Первая инвалидация заводит метку, с нее ведется журнал.
+        self.worker_one.delete('warm')
+
+    def test_value_is_shared_between_workers(self):
+        """Запись одного процесса видна другому."""
+        self.worker_one.set('key', 'value')
+        self.assertEqual(self.worker_two.get('key'), 'value')
+        self.assertEqual(self.worker_two.shared_hits, 1)
+        self.assertEqual(self.worker_two.get('key'), 'value')
+        self.assertEqual(self.worker_two.local_hits, 1)
+
+    def test_invalidation_evicts_local_tier_everywhere(self):
+        """После incr и delete в одном процессе другой не читает старое."""
+        self.worker_one.set('version', 1)
+        self.assertEqual(self.worker_two.get('version'), 1)
+        self.worker_one.incr('version')
+        self.assertEqual(self.worker_two.get('version'), 2)
+        self.worker_one.delete('version')
+        self.assertIsNone(self.worker_two.get('version'))
+
+    def test_invalidation_keeps_other_keys(self):
+        """Заполнение и инвалидация ключа не сбрасывают остальные ключи."""
+        self.worker_one.set('key', 'value')
+        self.worker_two.get('key')
+        self.worker_one.set('other', 'value')
+        self.worker_one.delete('gone')
+        self.assertEqual(self.worker_two.get('key'), 'value')
+        self.assertEqual(self.worker_two.local_hits, 1)
+
+    def test_lost_log_clears_local_tier(self):
+        """Без журнала инвалидаций локальный уровень очищается целиком."""
+        self.worker_one.set('key', 'value')
+        self.worker_two.get('key')
+        self.worker_one.delete('gone')
+        caches['shared'].clear()
+        self.assertIsNone(self.worker_two.get('key'))
+
+    def test_local_tier_is_bounded(self):
+        """Локальный уровень хранит не больше LOCAL_MAX_ENTRIES."""
+        self.worker_one.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(
+            self.worker_two.get_many(['a', 'b', 'c']),
+            {'a': 1, 'b': 2, 'c': 3}
+        )
+        self.assertEqual(len(self.worker_two._local), 2)
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    """Проверяем предупреждение о LocMemCache в общем уровне кэша."""
+
+    def test_locmem_shared_cache_warns_without_debug(self):
+        """Без DEBUG LocMemCache в общем уровне дает core.W001."""
+        with self.settings(DEBUG=False):
+            self.assertEqual(
+                [error.id for error in check_shared_cache(None)],
+                ['core.W001'],
+            )
+
+    def test_real_shared_cache_passes(self):
+        """Общий кэш вне процесса проверку проходит."""
+        shared_caches = copy.deepcopy(settings.CACHES)
+        shared_caches['shared']['BACKEND'] = (
+            'django.core.cache.backends.db.DatabaseCache'
+        )
+        with self.settings(DEBUG=False, CACHES=shared_caches):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class BackgroundTest(SimpleTestCase):
+    """Проверяем общий пул фоновых задач."""
+
+    def test_submit_runs_task_and_closes_connections(self):
+        """Задача выполняется в пуле, соединения после нее закрываются."""
+        done = []
+        with mock.patch('core.background.close_old_connections') as close:
+            submit(done.append, 1, pool='test', workers=1).result()
+        self.assertEqual(done, [1])
+        close.assert_called_once_with()
+
+    def test_failed_task_is_logged(self):
+        """Ошибка задачи пишется в лог и не роняет поток."""
+        with self.assertLogs('core.background', 'ERROR'):
+            run(int, 'x')
+
+
+class PerformanceMiddlewareTest(TestCase):
+    """Проверяем замеры запросов в PerformanceMiddleware."""
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(username='Author')
+        Post.objects.create(author=author, text='Пост')
+
+    @override_settings(PERF_SAMPLE_RATE=1, PERF_SERVER_TIMING=True)
+    def test_sampled_request_is_measured(self):
+        """Замеренный запрос пишет строку JSON и Server-Timing."""
+        caches['default'].clear()
+        with self.assertLogs('yatube.perf', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['bytes'], len(response.content))
+        self.assertGreater(record['sql_queries'], 0)
+        self.assertGreater(record['render_ms'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+        self.assertIn('includes/article.html', record['templates_ms'])
+        self.assertIn(
+            f'db;dur={record["sql_ms"]}', response['Server-Timing']
+        )
+
+    @override_settings(PERF_SAMPLE_RATE=1, PERF_SERVER_TIMING=True)
+    def test_server_timing_only_for_internal_requests(self):
+        """Внешний посетитель не получает метрики в Server-Timing."""
+        with self.assertLogs('yatube.perf', 'INFO'):
+            response = self.client.get(
+                reverse('posts:index'), REMOTE_ADDR='203.0.113.1'
+            )
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_unsampled_request_is_skipped(self):
+        """Запрос вне выборки не замеряется."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class TemplateCacheTest(TestCase):
+    """Проверяем прогрев шаблонов и замер их рендера."""
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(username='Author')
+        Post.objects.bulk_create(
+            [Post(author=author, text=f'Пост {i}') for i in range(3)]
+        )
+
+    def test_warm_templates_fills_cached_loader(self):
+        """Прогрев компилирует шаблоны проекта в кэш загрузчика."""
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['APP_DIRS'] = False
+        templates[0]['OPTIONS']['loaders'] = [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ]
+        with override_settings(TEMPLATES=templates, TEMPLATE_CACHE=True):
+            engine = engines['django'].engine
+            self.assertIn('includes/article.html', template_names(engine))
+            self.assertGreater(warm_templates(), 0)
+            cached = engine.template_loaders[0].get_template_cache
+            self.assertIn('posts/index.html', cached)
+
+    def test_warm_templates_needs_template_cache(self):
+        """Без кэширующего загрузчика прогревать нечего."""
+        with override_settings(TEMPLATE_CACHE=False):
+            self.assertEqual(warm_templates(), 0)
+
+    def test_render_time_by_template(self):
+        """Время рендера раскладывается по шаблонам без двойного счета."""
+        caches['default'].clear()
+        with collect() as stats:
+            self.client.get(reverse('posts:index'))
+        calls, seconds = stats.templates['includes/article.html']
+        self.assertEqual(calls, 3)
+        self.assertLessEqual(
+            sum(seconds for calls, seconds in stats.templates.values()),
+            stats.render_seconds + 1e-6,
+        )
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class ProfilerTest(TestCase):
+    """Проверяем статистический профайлер и его страницу."""
+    def test_profiler_samples_running_code(self):
+        """Профайлер видит функцию, в которой поток проводит время."""
+        sampler = SamplingProfiler()
+        sampler.start(10, 0.001, 0.5)
+        busy_loop(0.2)
+        sampler.stop()
+        self.assertFalse(sampler.running)
+        self.assertGreater(sampler.samples, 0)
+        self.assertIn('busy_loop (', sampler.collapsed())
+        profile = sampler.speedscope()['profiles'][0]
+        self.assertEqual(len(profile['samples']), len(profile['weights']))
+
+    def test_profiler_skips_waiting_threads(self):
+        """Поток, который ждет события, в профиль не попадает."""
+        stop = threading.Event()
+        waiting = threading.Thread(target=stop.wait, name='waiting')
+        waiting.start()
+        sampler = SamplingProfiler()
+        sampler.start(10, 0.001, 0.5)
+        busy_loop(0.1)
+        sampler.stop()
+        stop.set()
+        waiting.join()
+        self.assertIn('busy_loop (', sampler.collapsed())
+        self.assertNotIn('wait (', sampler.collapsed())
+
+    def test_profiler_backs_off_over_overhead(self):
+        """При превышении накладных расходов интервал растет."""
+        sampler = SamplingProfiler()
+        sampler.start(10, 0.001, 0)
+        busy_loop(0.1)
+        sampler.stop()
+        self.assertGreater(sampler.interval, 0.001)
+
+    @override_settings(PROFILER_ENABLED=True)
+    def test_profiler_page_is_staff_only(self):
+        """Страница профайлера доступна только персоналу."""
+        url = reverse('profiler')
+        user = get_user_model().objects.create_user(username='User')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.post(url, {'action': 'start', 'duration': 5})
+        self.assertTrue(profiler.running)
+        self.client.post(url, {'action': 'stop'})
+        self.assertFalse(profiler.running)
+        response = self.client.get(url, {'format': 'speedscope'})
+        self.assertIn('profiles', json.loads(response.content))
+
+    def test_profiler_page_is_opt_in(self):
+        """Без PROFILER_ENABLED страницы нет."""
+        user = get_user_model().objects.create_user(
+            username='Staff', is_staff=True
+        )
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('profiler')).status_code, 404)
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """Проверяем пул соединений с базой."""
+    databases = '__all__'
+
+    def make_pool(self, **kwargs):
+        options = {
+            'min_size': 1, 'max_size': 2, 'timeout': 0.05, 'max_age': 60,
+        }
+        options.update(kwargs)
+        return ConnectionPool(**options)
+
+    def connect(self):
+        return sqlite3.connect(':memory:', check_same_thread=False)
+
+    def test_pool_reuses_connections(self):
+        """Вернувшееся соединение выдается снова без открытия нового."""
+        pool = self.make_pool()
+        with collect() as stats:
+            conn, born = pool.get(self.connect)
+            pool.put(conn, born)
+            self.assertEqual(pool.get(self.connect), (conn, born))
+        self.assertEqual(stats.db_connects, 1)
+
+    def test_pool_replaces_broken_connection(self):
+        """Сломанное соединение не выдается, вместо него открывается новое."""
+        pool = self.make_pool()
+        conn, born = pool.get(self.connect)
+        conn.close()
+        pool.put(conn, born)
+        fresh, _ = pool.get(self.connect)
+        self.assertIsNot(fresh, conn)
+        fresh.execute('SELECT 1')
+        self.assertEqual(pool.size, 1)
+
+    def test_pool_waits_then_times_out(self):
+        """Когда все соединения заняты, запрос ждет и получает ошибку."""
+        pool = self.make_pool()
+        pool.get(self.connect)
+        pool.get(self.connect)
+        with collect() as stats, self.assertRaises(OperationalError):
+            pool.get(self.connect)
+        self.assertGreaterEqual(stats.pool_wait_seconds, 0.05)
+
+    def test_pool_drops_old_connections(self):
+        """Соединение старше max_age закрывается при возврате."""
+        pool = self.make_pool(max_age=0)
+        pool.put(*pool.get(self.connect))
+        self.assertEqual((pool.size, pool.idle), (0, 0))
+
+    def test_backend_returns_connection_to_pool(self):
+        """Бэкенд с пулом не закрывает соединение в конце запроса."""
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {
+                **connections.databases['default'],
+                'ENGINE': 'core.db.backends.sqlite3',
+                'NAME': os.path.join(directory, 'pool.sqlite3'),
+                'OPTIONS': {'POOL_MIN_SIZE': 1, 'POOL_MAX_SIZE': 2},
+            }
+            backend = load_backend(settings_dict['ENGINE'])
+            wrapper = backend.DatabaseWrapper(settings_dict, 'pool_test')
+            wrapper.ensure_connection()
+            raw, born = wrapper.connection, wrapper.pool_born
+            wrapper.close()
+            self.assertEqual(wrapper.pool.idle, 1)
+            wrapper.ensure_connection()
+            self.assertIs(wrapper.connection, raw)
+            self.assertEqual(wrapper.pool_born, born)
+            wrapper.close()
+            wrapper.pool.discard(wrapper.pool.get(None)[0])
+
+
+@skipUnless('replica' in settings.DATABASES, 'нет базы-заглушки реплики')
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    """Проверяем чтение с реплики на двух отдельных базах SQLite.
+
+    Реплика здесь не получает записей основной базы, поэтому по данным
+    видно, откуда прочитана страница.
+    """
+    databases = {'default', 'replica'} & set(settings.DATABASES)
+
+    def setUp(self):
+        self.author = get_user_model().objects.create_user(username='Author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        # Вместе с кэшем уходят и отметки о свежей смене версий.
+        caches['default'].clear()
+
+    def index_posts(self, client=None):
+        response = (client or self.client).get(reverse('posts:index'))
+        return list(response.context['page_obj'])
+
+    def test_read_only_views_read_from_replica(self):
+        """Главная читается с реплики, где поста еще нет."""
+        self.assertEqual(self.index_posts(), [])
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_reads_pinned_to_primary_after_write(self):
+        """После записи клиент какое-то время читает основную базу."""
+        reader = get_user_model().objects.create_user(username='Reader')
+        self.client.force_login(reader)
+        response = self.client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertIn('pin_primary', response.cookies)
+        self.assertEqual(self.index_posts(), [self.post])
+
+    def test_fresh_version_bump_reads_primary(self):
+        """Сразу после смены версии страница читается с основной базы."""
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(len(self.index_posts(Client())), 2)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        """Отставшая реплика не используется."""
+        with mock.patch(
+            'core.db.routers.replica_lag', return_value=float('inf')
+        ):
+            self.assertEqual(self.index_posts(), [self.post])
+
+    def test_search_reads_from_replica(self):
+        """Поиск в чтениях с реплики идет по индексу реплики."""
+        post = Post.objects.create(author=self.author, text='Маршрутизация')
+        reset_state()
+        with replica_reads():
+            self.assertEqual(get_backend().search_ids('маршрутизация', 1), [])
+        self.assertEqual(
+            get_backend().search_ids('маршрутизация', 1), [post.pk]
+        )
+
+    def test_reads_after_write_in_request_use_primary(self):
+        """После записи в том же запросе чтения идут на основную базу."""
+        reset_state()
+        with replica_reads():
+            self.assertFalse(Post.objects.exists())
+            Post.objects.create(author=self.author, text='Еще пост')
+            self.assertEqual(Post.objects.count(), 2)
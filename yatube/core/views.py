@@ -1,5 +1,13 @@
 # core/views.py
-from django.shortcuts import render
+import json
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect, render
+
+from .profiler import profiler
 
 
 def page_not_found(request, exception):
@@ -14,3 +22,46 @@ def server_error(request):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403_csrf.html')
+
+
+@staff_member_required
+def profiler_page(request):
+    """Управление профайлером воркера, который обслужил запрос."""
+    if not settings.PROFILER_ENABLED:
+        raise Http404('Профайлер выключен.')
+    if request.method == 'POST':
+        if request.POST.get('action') == 'start':
+            try:
+                duration = float(request.POST.get('duration'))
+            except (TypeError, ValueError):
+                duration = settings.PROFILER_MAX_DURATION
+            duration = min(duration, settings.PROFILER_MAX_DURATION)
+            profiler.start(
+                duration,
+                settings.PROFILER_INTERVAL,
+                settings.PROFILER_MAX_OVERHEAD,
+            )
+        elif request.POST.get('action') == 'stop':
+            profiler.stop()
+        return redirect('profiler')
+    export = request.GET.get('format')
+    if export == 'collapsed':
+        response = HttpResponse(
+            profiler.collapsed(), content_type='text/plain; charset=utf-8'
+        )
+        filename = f'profile-{os.getpid()}.txt'
+    elif export == 'speedscope':
+        response = HttpResponse(
+            json.dumps(profiler.speedscope()),
+            content_type='application/json',
+        )
+        filename = f'profile-{os.getpid()}.speedscope.json'
+    else:
+        context = {
+            'profiler': profiler,
+            'pid': os.getpid(),
+            'max_overhead': settings.PROFILER_MAX_OVERHEAD,
+        }
+        return render(request, 'core/profiler.html', context)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,8 +1,238 @@
+import base64
+import binascii
+from datetime import datetime
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import SimpleLazyObject, cached_property, lazy
+
+# Разделитель полей внутри курсора.
+CURSOR_SEPARATOR: str = '|'
+# Направления листания для курсора.
+CURSOR_NEXT: str = 'n'
+CURSOR_PREVIOUS: str = 'p'
+
+
+def paginator(request, posts, **kwargs):
+    """Постраничный вывод ленты.
+
+    Первая страница и ссылки на соседние читаются по ключу (`?cursor=`):
+    без COUNT(*) и OFFSET, а есть ли следующая, видно по лишней записи.
+    Обычная `Page` с OFFSET остается только для явного `?page=N` (так
+    работают старые ссылки), в том же порядке `(pub_date, id)` и с
+    курсорами соседних страниц. Именованные аргументы уходят в
+    `CursorPaginator`.
+    """
+    cursors = CursorPaginator(posts, settings.POSTS_ON_PAGE, **kwargs)
+    if 'cursor' in request.GET:
+        return cursors.get_page(request.GET.get('cursor'))
+    if 'page' not in request.GET:
+        return cursors.first_page()
+    page = Paginator(cursors.ordered(), settings.POSTS_ON_PAGE).get_page(
+        request.GET.get('page')
+    )
+    return cursors.with_cursors(page)
+
+
+def comment_page(comments, cursor=None):
+    """Страница комментариев от старых к новым по токену `cursor`."""
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_ON_PAGE, ordering='pub_date'
+    )
+    return paginator.get_page(cursor)
+
+
+def encode_cursor(direction, pub_date, pk):
+    """Упаковывает позицию `(pub_date, id)` в непрозрачный токен."""
+    raw = CURSOR_SEPARATOR.join((direction, pub_date.isoformat(), str(pk)))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора, для битого токена вернет None."""
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        direction, pub_date, pk = raw.split(CURSOR_SEPARATOR)
+        position = (direction, datetime.fromisoformat(pub_date), int(pk))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS):
+        return None
+    return position
+
+
+class CursorPage:
+    """Страница курсорного пагинатора.
+
+    Повторяет ту часть интерфейса `Page`, которой пользуются шаблоны,
+    но вместо номеров страниц отдает токены соседних страниц. Записи
+    читаются при первом обращении: если страница целиком взята из кэша
+    фрагментов, запроса к базе нет.
+    """
+    is_cursor = True
+
+    def __init__(self, paginator, load):
+        self.paginator = paginator
+        self._load = load
+
+    @cached_property
+    def _loaded(self):
+        return self._load()
+
+    @property
+    def object_list(self):
+        return self._loaded[0]
+
+    @property
+    def next_cursor(self):
+        return self._loaded[1]
+
+    @property
+    def previous_cursor(self):
+        return self._loaded[2]
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class FirstPagePaginator(Paginator):
+    """`Paginator` первой страницы, прочитанной по ключу.
+
+    Сколько всего страниц, не считается: известно только, есть ли
+    вторая. `count` выполнит COUNT(*), только если его спросят.
+    """
+
+    def __init__(self, object_list, per_page, page):
+        super().__init__(object_list, per_page)
+        self.cursor_page = page
+
+    @cached_property
+    def num_pages(self):
+        return 2 if self.cursor_page.has_next() else 1
+
+
+class CursorPaginator:
+    """Пагинатор по ключу `(pub_date, id)` без COUNT(*) и OFFSET.
+
+    Каждая страница читается одним запросом `WHERE (pub_date, id) < ...
+    LIMIT per_page + 1`, поэтому глубокие страницы стоят столько же,
+    сколько первая. Работает и с моделями, и с `values()`-выборками.
+    """
+
+    def __init__(self, object_list, per_page, ordering='-pub_date'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+
+    def ordered(self, reverse=False):
+        """Выборка в порядке страниц: по полю даты, затем по id."""
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return self.object_list.order_by(
+            f'{prefix}{self.field}', f'{prefix}pk'
+        )
+
+    def _after(self, queryset, pub_date, pk, reverse):
+        """Отсекает записи до позиции курсора в нужном направлении.
+
+        Условие `pub_date <= курсор` дублирует дизъюнкцию, чтобы база
+        могла начать с диапазона по индексу, а не читать его с начала.
+        """
+        descending = self.descending != reverse
+        lookup = 'lt' if descending else 'gt'
+        return queryset.filter(
+            Q(**{f'{self.field}__{lookup}e': pub_date}),
+            Q(**{f'{self.field}__{lookup}': pub_date})
+            | Q(**{self.field: pub_date, f'pk__{lookup}': pk}),
+        )
+
+    def _position(self, obj):
+        if isinstance(obj, dict):
+            return obj[self.field], obj.get('pk', obj.get('id'))
+        return getattr(obj, self.field), obj.pk
+
+    def _cursor(self, direction, obj):
+        return encode_cursor(direction, *self._position(obj))
+
+    def get_page(self, cursor):
+        """Возвращает страницу по токену, битый токен дает первую.
+
+        Запрос выполняется при первом обращении к странице.
+        """
+        return CursorPage(self, lambda: self._load(cursor))
+
+    def _load(self, cursor):
+        position = decode_cursor(cursor)
+        if position is None:
+            items = list(self.ordered(False)[:self.per_page + 1])
+            has_more = len(items) > self.per_page
+            items = items[:self.per_page]
+            return self._page(items, has_next=has_more, has_previous=False)
+        direction, pub_date, pk = position
+        reverse = direction == CURSOR_PREVIOUS
+        queryset = self._after(self.ordered(reverse), pub_date, pk, reverse)
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if reverse:
+            items.reverse()
+            return self._page(items, has_next=True, has_previous=has_more)
+        return self._page(items, has_next=has_more, has_previous=True)
+
+    def first_page(self):
+        """Первая страница как обычная `Page`, но без COUNT(*) и OFFSET.
+
+        Читается, как и `get_page`, при первом обращении.
+        """
+        cursor_page = self.get_page(None)
+        paginator = FirstPagePaginator(
+            self.ordered(), self.per_page, cursor_page
+        )
+        page = Page(
+            SimpleLazyObject(lambda: cursor_page.object_list), 1, paginator
+        )
+        page.is_cursor = True
+        page.next_cursor = lazy(lambda: cursor_page.next_cursor or '', str)()
+        page.previous_cursor = None
+        return page
 
+    def with_cursors(self, page):
+        """Добавляет к `Page` по номеру курсоры соседних страниц."""
+        page.is_cursor = True
+        page.next_cursor = page.previous_cursor = None
+        if len(page) and page.has_next():
+            page.next_cursor = self._cursor(CURSOR_NEXT, page[-1])
+        if len(page) and page.has_previous():
+            page.previous_cursor = self._cursor(CURSOR_PREVIOUS, page[0])
+        return page
 
-def paginator(request, posts):
-    paginator = Paginator(posts, settings.POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    def _page(self, items, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if items and has_next:
+            next_cursor = self._cursor(CURSOR_NEXT, items[-1])
+        if items and has_previous:
+            previous_cursor = self._cursor(CURSOR_PREVIOUS, items[0])
+        return items, next_cursor, previous_cursor
@@ -1,6 +1,10 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import get_backend
+
+# Сколько найденных постов показывать в поиске админки.
+ADMIN_SEARCH_LIMIT: int = 1000
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,6 +14,13 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
     list_editable = ('group',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск идет по полнотекстовому индексу, а не через LIKE.
+        if not search_term:
+            return queryset, False
+        ids = get_backend().search_ids(search_term, ADMIN_SEARCH_LIMIT)
+        return queryset.filter(pk__in=ids), False
+
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('post', 'author', 'text', 'pub_date')
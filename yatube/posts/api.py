@@ -0,0 +1,236 @@
+import json
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from core.db.routers import read_replica
+
+from .addons import CursorPaginator, comment_page
+from .caching import POST_AUTHOR_KEY, cached_page
+from .models import Comment, Group, Post, User
+from .timeline import follow_feed
+from .views import (accepts_encoding, comments_scopes, group_scopes,
+                    index_scopes, post_scopes, profile_scopes)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Поля поста в API и выражения `values()` для них.
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+# Поля поста в лентах. Комментарий меняет только версию страницы поста,
+# а страницы лент остались бы в кэше со старым счетчиком.
+FEED_FIELDS = {
+    name: lookup for name, lookup in POST_FIELDS.items()
+    if name != 'comments_count'
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'author': 'author__username',
+    'text': 'text',
+    'pub_date': 'pub_date',
+}
+# Ответы короче этого не сжимаются: заголовки дороже выигрыша.
+API_COMPRESS_MIN_LENGTH: int = 200
+
+
+class FieldsError(ValueError):
+    """В `?fields=` запрошено неизвестное поле."""
+
+
+def not_found(detail):
+    return json_response({'detail': detail}, status=404)
+
+
+def json_response(data, status=200):
+    """Компактный JSON без пробелов и экранирования кириллицы."""
+    return HttpResponse(
+        json.dumps(data, ensure_ascii=False, separators=(',', ':')),
+        content_type='application/json',
+        status=status,
+    )
+
+
+def compressed(view):
+    """Сжимает ответ brotli (если он установлен) или gzip.
+
+    Кодировка выбирается по `Accept-Encoding`. Как и `GZipMiddleware`,
+    делает ETag слабым: сжатое тело отличается от исходного побайтно.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < API_COMPRESS_MIN_LENGTH
+        ):
+            return response
+        if brotli is not None and accepts_encoding(request, 'br'):
+            content, encoding = brotli.compress(response.content), 'br'
+        elif accepts_encoding(request, 'gzip'):
+            content, encoding = compress_string(response.content), 'gzip'
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        return response
+    return wrapper
+
+
+def selected_fields(request, fields):
+    """Поля из `?fields=a,b` или все, если параметра нет."""
+    names = [
+        name for name in request.GET.get('fields', '').split(',') if name
+    ]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise FieldsError(', '.join(unknown))
+    return {name: fields[name] for name in names} if names else fields
+
+
+def serialize(row, fields):
+    """Переводит строку `values()` в словарь API без создания моделей."""
+    record = {name: row[lookup] for name, lookup in fields.items()}
+    if 'pub_date' in record:
+        record['pub_date'] = record['pub_date'].isoformat()
+    if record.get('image'):
+        record['image'] = settings.MEDIA_URL + record['image']
+    return record
+
+
+def feed_response(request, posts, ordering='-pub_date', fields=FEED_FIELDS,
+                  per_page=None):
+    """Страница ленты в JSON с курсорами соседних страниц.
+
+    Поля позиции курсора выбираются всегда, но в ответ попадают, только
+    если их запросили.
+    """
+    try:
+        fields = selected_fields(request, fields)
+    except FieldsError as error:
+        return json_response(
+            {'detail': f'Неизвестные поля: {error}'}, status=400
+        )
+    lookups = {'pk', ordering.lstrip('-'), *fields.values()}
+    page = CursorPaginator(
+        posts.values(*lookups),
+        per_page or settings.POSTS_ON_PAGE,
+        ordering=ordering,
+    ).get_page(request.GET.get('cursor'))
+    return json_response({
+        'results': [serialize(row, fields) for row in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+@compressed
+@cached_page(index_scopes)
+@read_replica
+def index(request):
+    return feed_response(request, Post.objects.all())
+
+
+@compressed
+@cached_page(group_scopes)
+@read_replica
+def group_posts(request, slug):
+    group_id = (
+        Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    )
+    if group_id is None:
+        return not_found('Группа не найдена.')
+    return feed_response(request, Post.objects.filter(group_id=group_id))
+
+
+@compressed
+@cached_page(profile_scopes)
+@read_replica
+def profile(request, username):
+    author_id = (
+        User.objects
+        .filter(username=username)
+        .values_list('pk', flat=True)
+        .first()
+    )
+    if author_id is None:
+        return not_found('Автор не найден.')
+    return feed_response(request, Post.objects.filter(author_id=author_id))
+
+
+@compressed
+@read_replica
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return json_response({'detail': 'Нужно войти.'}, status=401)
+    posts = follow_feed(request.user).order_by()
+    return feed_response(request, posts, ordering='-feed_date')
+
+
+@compressed
+@cached_page(post_scopes)
+@read_replica
+def post_detail(request, post_id):
+    try:
+        fields = selected_fields(request, POST_FIELDS)
+    except FieldsError as error:
+        return json_response(
+            {'detail': f'Неизвестные поля: {error}'}, status=400
+        )
+    post = (
+        Post.objects
+        .filter(pk=post_id)
+        .values('author__username', *fields.values())
+        .first()
+    )
+    if post is None:
+        return not_found('Пост не найден.')
+    author = post['author__username']
+    cache.add(POST_AUTHOR_KEY.format(post_id), author, None)
+    # Первая страница комментариев, остальные — через `comments`.
+    comments = comment_page(
+        Comment.objects
+        .filter(post_id=post_id)
+        .values(*COMMENT_FIELDS.values())
+    )
+    return json_response({
+        'post': serialize(post, fields),
+        'comments': [serialize(row, COMMENT_FIELDS) for row in comments],
+        'comments_next_cursor': comments.next_cursor,
+    })
+
+
+@compressed
+@cached_page(comments_scopes)
+@read_replica
+def comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return not_found('Пост не найден.')
+    return feed_response(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        ordering='pub_date',
+        fields=COMMENT_FIELDS,
+        per_page=settings.COMMENTS_ON_PAGE,
+    )
@@ -0,0 +1,90 @@
+import hashlib
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Node
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .thumbnails import image_manifest
+
+# Ключ готового HTML поста: версия разметки, id и ревизия.
+ARTICLE_KEY: str = 'article:{}:{}:{}'
+ARTICLE_TEMPLATE: str = 'includes/article.html'
+
+
+def _template_sources(name):
+    """Исходники шаблона и всех шаблонов, которые он подключает."""
+    template = get_template(name).template
+    yield template.source
+    for node in template.nodelist.get_nodes_by_type(Node):
+        # `{% include 'имя' %}` и inclusion_tag со своим шаблоном.
+        included = getattr(getattr(node, 'template', None), 'var', None)
+        included = getattr(node, 'filename', included)
+        if isinstance(included, str):
+            yield from _template_sources(included)
+
+
+@lru_cache(maxsize=None)
+def markup_version():
+    """Версия разметки поста — хеш исходников его шаблонов.
+
+    Правка шаблона меняет ключи готового HTML после перезапуска, и
+    старые записи просто перестают читаться.
+    """
+    digest = hashlib.md5()
+    for source in _template_sources(ARTICLE_TEMPLATE):
+        digest.update(source.encode())
+    return digest.hexdigest()[:8]
+
+
+def article_key(post):
+    return ARTICLE_KEY.format(markup_version(), post.pk, post.revision)
+
+
+def new_revision(previous=0):
+    """Новая ревизия: метка времени в мс, всегда больше прежней.
+
+    Метка, а не счетчик: правка поста и переименование группы,
+    записанные одновременно, не получат одну и ту же ревизию.
+    """
+    return max(int(time.time() * 1000), previous + 1)
+
+
+def revise_posts(**filters):
+    """Меняет ревизию постов по фильтру одним UPDATE."""
+    return Post.objects.filter(**filters).update(revision=new_revision())
+
+
+def _cacheable(post):
+    # Заглушку вместо картинки нельзя класть в кэш: ревизия поста не
+    # сменится, когда варианты картинки будут готовы. Манифест читается
+    # из кэша, а если его вытеснили — из хранилища, см. `load_manifest`.
+    return not post.image or image_manifest(post.image) is not None
+
+
+def render_articles(posts):
+    """Список HTML постов страницы, готовые берутся одним `get_many`.
+
+    Недостающие рендерятся по `includes/article.html` и сохраняются
+    одним `set_many`. Разметка поста не зависит от читателя, поэтому
+    кэш общий для всех.
+    """
+    posts = list(posts)
+    keys = [article_key(post) for post in posts]
+    cached = cache.get_many(keys)
+    missing = {}
+    parts = []
+    for key, post in zip(keys, posts):
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(ARTICLE_TEMPLATE, {'post': post})
+            if _cacheable(post):
+                missing[key] = html
+        parts.append(mark_safe(html))
+    if missing:
+        cache.set_many(missing, settings.ARTICLE_CACHE_TIMEOUT)
+    return parts
@@ -0,0 +1,465 @@
+import copy
+import random
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from django.utils import timezone
+
+from core.instrumentation import collect
+from core.models import explicit_pub_dates
+from core.template_cache import warm_templates
+
+from . import timeline
+from .comment_queue import drain
+from .links import clear_links, post_url
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Сколько записей вставлять одним bulk_create.
+SEED_BATCH_SIZE: int = 5000
+# Показатель степени Ципфа: чем больше, тем сильнее перекос.
+ZIPF_EXPONENT: float = 1.1
+# Комментариев у поста, на котором меряется post_detail.
+DETAIL_COMMENTS: int = 50
+# Бюджеты по страницам: запросов к базе и миллисекунд. В ленте
+# подписок запросов больше на холодном кэше: там ищутся популярные
+# авторы, чьи посты догружаются отдельно.
+BUDGETS = {
+    'index': {'queries': 3, 'sql_ms': 50, 'render_ms': 100},
+    'group_posts': {'queries': 4, 'sql_ms': 50, 'render_ms': 100},
+    'profile': {'queries': 4, 'sql_ms': 50, 'render_ms': 100},
+    'post_detail': {'queries': 3, 'sql_ms': 50, 'render_ms': 100},
+    'follow_index': {'queries': 8, 'sql_ms': 50, 'render_ms': 100},
+    # JSON API не рендерит шаблонов, зато ему считаем время CPU.
+    'api_index': {'queries': 1, 'sql_ms': 50, 'cpu_ms': 50},
+    'api_group_posts': {'queries': 2, 'sql_ms': 50, 'cpu_ms': 50},
+    'api_profile': {'queries': 2, 'sql_ms': 50, 'cpu_ms': 50},
+    'api_post_detail': {'queries': 2, 'sql_ms': 50, 'cpu_ms': 50},
+    'api_follow_index': {'queries': 7, 'sql_ms': 50, 'cpu_ms': 50},
+}
+
+# Режимы шаблонов для сравнения: загрузчики без кэша, кэширующий
+# загрузчик с холодным кэшем и он же после `warm_templates()`.
+TEMPLATE_MODES = ('uncached', 'cached', 'prewarmed')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def zipf_weights(size, exponent=ZIPF_EXPONENT):
+    """Накопленные веса рангов `1..size` по закону Ципфа."""
+    weights, total = [], 0.0
+    for rank in range(1, size + 1):
+        total += 1 / rank ** exponent
+        weights.append(total)
+    return weights
+
+
+def _insert(model, objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= SEED_BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+def seed(users=10000, posts=1000000, groups=100, follows=10, seed=1):
+    """Наполняет базу данными объема боевого сайта.
+
+    Авторство постов, группы и подписки распределены по Ципфу: у
+    немногих авторов почти все посты и подписчики. Ленту подписок
+    строим только читателю из `view_cases()`, остальным она не нужна
+    для замеров, а заняла бы десятки миллионов строк.
+    """
+    rng = random.Random(seed)
+    _insert(
+        User,
+        (
+            User(username=f'user{number}', first_name='Пользователь',
+                 last_name=str(number))
+            for number in range(users)
+        ),
+    )
+    _insert(
+        Group,
+        (
+            Group(title=f'Группа {number}', slug=f'group-{number}',
+                  description='Описание группы')
+            for number in range(groups)
+        ),
+    )
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    group_ids = list(Group.objects.order_by('pk').values_list('pk', flat=True))
+    user_weights = zipf_weights(len(user_ids))
+    group_weights = zipf_weights(len(group_ids))
+    now = timezone.now()
+    authors = rng.choices(user_ids, cum_weights=user_weights, k=posts)
+    with explicit_pub_dates(Post, Comment):
+        _insert(
+            Post,
+            (
+                Post(
+                    author_id=author_id,
+                    group_id=(
+                        rng.choices(group_ids, cum_weights=group_weights)[0]
+                        if rng.random() < 0.7 else None
+                    ),
+                    text=f'Пост номер {number} о жизни и котиках',
+                    pub_date=now - timedelta(seconds=(posts - number) * 30),
+                )
+                for number, author_id in enumerate(authors)
+            ),
+        )
+        detail = Post.objects.filter(author_id=user_ids[0]).latest('pub_date')
+        _insert(
+            Comment,
+            (
+                Comment(
+                    post=detail,
+                    author_id=rng.choice(user_ids),
+                    text=f'Комментарий {number}',
+                    pub_date=now + timedelta(seconds=number),
+                )
+                for number in range(DETAIL_COMMENTS)
+            ),
+        )
+    follow_pairs = set()
+    for user_id in user_ids:
+        count = min(int(rng.expovariate(1 / follows)) + 1, len(user_ids) - 1)
+        authors = rng.choices(user_ids, cum_weights=user_weights, k=count)
+        follow_pairs.update(
+            (user_id, author_id) for author_id in authors
+            if author_id != user_id
+        )
+    _insert(
+        Follow,
+        (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in sorted(follow_pairs)
+        ),
+    )
+    # bulk_create не шлет сигналов, поэтому счетчики и ленту
+    # пересобираем явно.
+    call_command('recount_counters', stdout=StringIO())
+    reader = _reader()
+    for author_id in reader.follower.values_list('author_id', flat=True):
+        timeline.backfill(reader.pk, author_id)
+
+
+@contextmanager
+def bench_database(keepdb=False, log=None, name=None, **seed_options):
+    """Тестовая база для замеров, пустая наполняется `seed()`.
+
+    Как и тестовый раннер, замеры идут без DEBUG и debug_toolbar. С
+    `keepdb` база и данные сохраняются для следующих запусков. `name`
+    задает имя тестовой базы: SQLite по умолчанию держит ее в памяти,
+    а для замеров из нескольких потоков нужен файл.
+    """
+    old_name = connection.settings_dict['NAME']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = name
+    setup_test_environment(debug=False)
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, keepdb=keepdb
+    )
+    try:
+        if not Post.objects.exists():
+            if log is not None:
+                log('Наполняем базу...')
+            seed(**seed_options)
+        yield
+    finally:
+        connection.creation.destroy_test_db(
+            old_name, verbosity=0, keepdb=keepdb
+        )
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+        teardown_test_environment()
+
+
+def _reader():
+    """Пользователь с наибольшим числом подписок."""
+    return User.objects.order_by('-counters__following_count', 'pk').first()
+
+
+def view_cases():
+    """Замеряемые страницы: `(имя, url, пользователь или None)`."""
+    author = User.objects.order_by('-counters__posts_count', 'pk').first()
+    group = (
+        Group.objects
+        .annotate(posts_total=Count('posts'))
+        .order_by('-posts_total', 'pk')
+        .first()
+    )
+    detail = Post.objects.order_by('-comments_count', '-pk').first()
+    pages = [
+        ('index', 'index', (), None),
+        ('group_posts', 'group_list', (group.slug,), None),
+        ('profile', 'profile', (author.username,), None),
+        ('post_detail', 'post_detail', (detail.pk,), None),
+        ('follow_index', 'follow_index', (), _reader()),
+    ]
+    # Каждая страница меряется и в HTML, и в JSON API.
+    return [
+        (prefix + name, reverse(f'posts:{prefix}{url_name}', args=args),
+         user)
+        for prefix in ('', 'api_')
+        for name, url_name, args, user in pages
+    ]
+
+
+def measure(client, url, repeat=5):
+    """Замер страницы: запросы, время SQL, рендера, CPU и всего ответа.
+
+    Кэш перед замером очищается. Число запросов берется худшее, с
+    холодного кэша, а время — медиана по всем повторам. CPU — время
+    процессора потока, который обрабатывал запрос.
+    """
+    cache.clear()
+    runs = []
+    for _ in range(repeat):
+        with collect() as stats:
+            started = time.perf_counter()
+            cpu_started = time.thread_time()
+            response = client.get(url)
+            cpu = time.thread_time() - cpu_started
+            total = time.perf_counter() - started
+        runs.append((stats.queries, stats.sql_seconds, stats.render_seconds,
+                     cpu, total, response.status_code))
+    queries, sql, render, cpu, total, status = zip(*runs)
+    return {
+        'status': max(status),
+        'queries': max(queries),
+        'sql_ms': round(statistics.median(sql) * 1000, 2),
+        'render_ms': round(statistics.median(render) * 1000, 2),
+        'cpu_ms': round(statistics.median(cpu) * 1000, 2),
+        'total_ms': round(statistics.median(total) * 1000, 2),
+    }
+
+
+def run_cases(client, cases, repeat=5):
+    """Замеряет все страницы, вернет словарь `имя -> замер`.
+
+    Кэш целых страниц выключен: иначе повторы анонимных страниц
+    мерили бы только чтение из кэша, а не работу view.
+    """
+    results = {}
+    with override_settings(PAGE_CACHE_TIMEOUT=0):
+        for name, url, user in cases:
+            if user is None:
+                client.logout()
+            else:
+                client.force_login(user)
+            results[name] = dict(url=url, **measure(client, url, repeat))
+    client.logout()
+    return results
+
+
+def over_budget(results, budgets=BUDGETS):
+    """Список нарушений бюджета: `(страница, метрика, значение, бюджет)`."""
+    violations = []
+    for name, result in results.items():
+        if result['status'] != 200:
+            violations.append((name, 'status', result['status'], 200))
+        for metric, limit in budgets.get(name, {}).items():
+            if result[metric] > limit:
+                violations.append((name, metric, result[metric], limit))
+    return violations
+
+
+def template_settings(cached):
+    """`TEMPLATES` проекта с кэширующим загрузчиком или без кэша."""
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = (
+        [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+        if cached else TEMPLATE_LOADERS
+    )
+    return templates
+
+
+def measure_templates(client, url, repeat=20):
+    """Рендер страницы: первый запрос, медиана и разбивка по шаблонам.
+
+    Кэш очищается перед каждым запросом, чтобы фрагменты лент
+    рендерились заново. В разбивке — среднее за запрос собственное
+    время шаблона без вложенных `{% include %}`.
+    """
+    renders = []
+    templates = {}
+    for _ in range(repeat):
+        cache.clear()
+        with collect() as stats:
+            client.get(url)
+        renders.append(stats.render_seconds)
+        for name, (calls, seconds) in stats.templates.items():
+            templates[name] = templates.get(name, 0.0) + seconds
+    ranked = sorted(templates.items(), key=lambda item: item[1], reverse=True)
+    warm = statistics.median(renders[1:] or renders)
+    return {
+        'first_ms': round(renders[0] * 1000, 2),
+        'render_ms': round(warm * 1000, 2),
+        'templates': {
+            name: round(seconds / repeat * 1000, 3)
+            for name, seconds in ranked
+        },
+    }
+
+
+def run_template_modes(client, cases, repeat=20):
+    """Замеряет страницы во всех `TEMPLATE_MODES`.
+
+    Для каждой страницы и режима движок шаблонов создается заново, так
+    что первый запрос без прогрева платит за разбор шаблонов.
+    """
+    results = {}
+    for name, url, user in cases:
+        if user is None:
+            client.logout()
+        else:
+            client.force_login(user)
+        for mode in TEMPLATE_MODES:
+            cached = mode != 'uncached'
+            with override_settings(
+                TEMPLATES=template_settings(cached),
+                TEMPLATE_CACHE=cached,
+                PAGE_CACHE_TIMEOUT=0,
+            ):
+                if mode == 'prewarmed':
+                    warm_templates()
+                results[name, mode] = measure_templates(client, url, repeat)
+    client.logout()
+    return results
+
+
+def page_links(size=None):
+    """Адреса одной страницы ленты: `(имя маршрута, аргументы)`.
+
+    По три ссылки на пост, как в `includes/article.html`, плюс шапка и
+    переключатель лент.
+    """
+    links = [
+        ('posts:index', ()), ('posts:search', ()), ('posts:post_create', ()),
+        ('posts:index', ()), ('posts:follow_index', ()),
+    ]
+    for number in range(size or settings.POSTS_ON_PAGE):
+        links += [
+            ('posts:profile', (f'user{number}',)),
+            ('posts:post_detail', (number + 1,)),
+            ('posts:group_list', (f'group{number % 5}',)),
+        ]
+    return links
+
+
+def measure_links(links, repeat=1000):
+    """Микросекунды на страницу у `reverse()` и у `post_url()`.
+
+    `post_url` меряется с пустой памятью адресов, как на странице из
+    новых постов, и с заполненной. Берется медиана по повторам.
+    """
+    def run(build, cold=False):
+        runs = []
+        for _ in range(repeat):
+            if cold:
+                clear_links()
+            started = time.perf_counter()
+            for viewname, args in links:
+                build(viewname, *args)
+            runs.append(time.perf_counter() - started)
+        return round(statistics.median(runs) * 10 ** 6, 1)
+
+    def by_reverse(viewname, *args):
+        return reverse(viewname, args=args)
+
+    return {
+        'links': len(links),
+        'reverse_us': run(by_reverse),
+        'cold_us': run(post_url, cold=True),
+        'warm_us': run(post_url),
+    }
+
+
+def _write_comments(user, url, detail, comments, errors):
+    """Поток одного автора: `comments` комментариев, ошибки в `errors`."""
+    client = Client()
+    try:
+        client.force_login(user)
+    except OperationalError as error:
+        # Пул соединений исчерпан: не отправлен ни один комментарий.
+        errors.extend([repr(error)] * comments)
+        connection.close()
+        return
+    try:
+        for number in range(comments):
+            try:
+                response = client.post(url, {'text': f'Комментарий {number}'})
+            except OperationalError as error:
+                errors.append(repr(error))
+            else:
+                if response.get('Location') != detail:
+                    errors.append(response.status_code)
+    finally:
+        connection.close()
+
+
+def measure_comment_writes(post, users, comments=50, write_behind=False):
+    """Пропускная способность `add_comment` при одновременных авторах.
+
+    Каждый пользователь в своем потоке отправляет `comments`
+    комментариев к посту. `accept` — сколько комментариев в секунду
+    принято, `total` — с учетом переноса остатка очереди в базу.
+    Запросы, упавшие на блокировке базы или на пуле соединений,
+    считаются в `errors`.
+    """
+    url = reverse('posts:add_comment', args=[post.pk])
+    detail = reverse('posts:post_detail', args=[post.pk])
+    errors = []
+
+    # Как и у живых авторов, страница поста уже была открыта.
+    Client().get(detail)
+    before = Comment.objects.filter(post=post).count()
+    threads = [
+        threading.Thread(
+            target=_write_comments,
+            args=(user, url, detail, comments, errors),
+        )
+        for user in users
+    ]
+    with override_settings(COMMENT_WRITE_BEHIND=write_behind):
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        accepted = time.perf_counter() - started
+        drain()
+        total = time.perf_counter() - started
+    saved = Comment.objects.filter(post=post).count() - before
+    return {
+        'writers': len(users),
+        'saved': saved,
+        'errors': len(errors),
+        'accept_per_s': round(saved / accepted),
+        'total_per_s': round(saved / total),
+        'accept_ms': round(accepted * 1000, 1),
+        'total_ms': round(total * 1000, 1),
+    }
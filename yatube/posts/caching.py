@@ -0,0 +1,194 @@
+import hashlib
+import math
+import time
+from functools import wraps
+from urllib.parse import quote
+
+from core.db.routers import pin_primary
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+# Ключ версии кэша для области: все посты или подписки пользователя.
+VERSION_KEY: str = 'feed_version:{}'
+# Отметка о недавней смене версии области. Пока она жива, реплики
+# могут еще не видеть запись, и чтения запроса идут на основную базу.
+BUMPED_KEY: str = 'feed_bumped:{}'
+# Область версии для всех лент с постами.
+POSTS_SCOPE: str = 'posts'
+# Область версии картинок: готовые варианты сменяют заглушки.
+IMAGES_SCOPE: str = 'images'
+# Ключ страницы для анонимов: версии ее областей и адрес с запросом.
+PAGE_KEY: str = 'page:{}:{}'
+# Имя автора поста, чтобы считать ETag страницы поста без базы.
+POST_AUTHOR_KEY: str = 'post_author:{}'
+
+
+def follow_scope(user_id):
+    """Область версии ленты подписок пользователя."""
+    return f'follow:{user_id}'
+
+
+def group_scope(slug):
+    """Область версии страницы группы."""
+    # Имена областей идут в ключи кэша и в заголовок Surrogate-Key,
+    # поэтому кириллица и пробелы в них кодируются.
+    return f'group:{quote(slug)}'
+
+
+def author_scope(username):
+    """Область версии профиля автора: посты, счетчики, подписки."""
+    return f'author:{quote(username)}'
+
+
+def post_scope(post_id):
+    """Область версии страницы поста с комментариями."""
+    return f'post:{post_id}'
+
+
+def _new_version():
+    # Метка времени не повторяет версию, вытесненную из кэша.
+    return int(time.time() * 1000)
+
+
+def feed_version(*scopes):
+    """Текущая версия кэша для областей, входит в ключ фрагмента.
+
+    Все версии читаются одним `get_many`, недостающие создаются. Если
+    версия какой-то области сменилась недавно, остальные чтения запроса
+    идут на основную базу: иначе страница с отставшей реплики попала
+    бы в кэш и в ETag под новой версией.
+    """
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    bumped = []
+    if settings.REPLICA_DATABASES:
+        bumped = [BUMPED_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys + bumped)
+    if any(key in versions for key in bumped):
+        pin_primary()
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump_version(scope):
+    """Инвалидирует все фрагменты области сменой ее версии."""
+    key = VERSION_KEY.format(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Версии нет в общем кэше: `delete` сбросит ее локальные копии.
+        cache.delete(key)
+        cache.add(key, _new_version(), None)
+    _mark_bumped([scope])
+
+
+def bump_versions(scopes):
+    """Как `bump_version` для многих областей, одним `delete_many`.
+
+    Версия без ключа создается заново меткой времени, поэтому удаление
+    меняет ее так же, как `incr`.
+    """
+    scopes = list(scopes)
+    cache.delete_many([VERSION_KEY.format(scope) for scope in scopes])
+    _mark_bumped(scopes)
+
+
+def _mark_bumped(scopes):
+    if settings.REPLICA_DATABASES:
+        # Реплика отстает не больше REPLICA_MAX_LAG на момент замера,
+        # а замер может быть старым на REPLICA_LAG_CHECK_INTERVAL.
+        window = settings.REPLICA_MAX_LAG + settings.REPLICA_LAG_CHECK_INTERVAL
+        cache.set_many(
+            {BUMPED_KEY.format(scope): True for scope in scopes},
+            math.ceil(window),
+        )
+
+
+def page_etag(request, *scopes):
+    """ETag страницы по версиям областей, без запросов к базе.
+
+    Страница зависит и от читателя, и от CSRF-токена в формах, поэтому
+    в ETag входят ключ сессии и cookie CSRF. Ключ берется из cookie:
+    сама сессия читается из базы, а до ответа 304 она не нужна. При
+    входе и выходе ключ меняется, так что читатель в нем учтен.
+    """
+    raw = ':'.join((
+        feed_version(*scopes, IMAGES_SCOPE),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def cached_page(scopes_func):
+    """Декоратор view: ETag для всех и кэш страницы для анонимов.
+
+    `scopes_func` получает аргументы view и возвращает области версий,
+    от которых зависит страница, или None, если их не узнать без базы.
+    Анонимам страница отдается из кэша целиком, с заголовками
+    `Surrogate-Key` (те же области) и `Cache-Control` для CDN. Смена
+    версии любой области сбрасывает страницу в нашем кэше; CDN сам не
+    очищается и держит ее до `PAGE_CACHE_TIMEOUT` (`s-maxage`), а
+    `Surrogate-Key` позволяет очистить CDN по области вручную.
+    """
+    def etag_func(request, *args, **kwargs):
+        scopes = scopes_func(request, *args, **kwargs)
+        return None if scopes is None else page_etag(request, *scopes)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.session.get(SESSION_KEY):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+                return response
+            scopes = scopes_func(request, *args, **kwargs)
+            if scopes is None or not settings.PAGE_CACHE_TIMEOUT:
+                return view(request, *args, **kwargs)
+            return _anonymous_page(
+                request, (*scopes, IMAGES_SCOPE), view, args, kwargs
+            )
+        return condition(etag_func=etag_func)(wrapper)
+    return decorator
+
+
+def _anonymous_page(request, scopes, view, args, kwargs):
+    key = PAGE_KEY.format(
+        feed_version(*scopes),
+        hashlib.md5(request.get_full_path().encode()).hexdigest(),
+    )
+    cached = cache.get(key)
+    if cached is not None:
+        content, headers = cached
+        response = HttpResponse(content)
+        for name, value in headers:
+            response[name] = value
+    else:
+        response = view(request, *args, **kwargs)
+        # Ответы с cookie и CSRF-токеном у каждого клиента свои.
+        if (
+            response.status_code != 200
+            or response.streaming
+            or response.cookies
+            or request.META.get('CSRF_COOKIE_USED')
+        ):
+            return response
+        # Заголовки сохраняются все: Vary, Content-Language и другие
+        # должны быть у ответа из кэша такими же, как у свежего.
+        cache.set(
+            key,
+            (response.content, list(response.items())),
+            settings.PAGE_CACHE_TIMEOUT,
+        )
+    patch_cache_control(
+        response, public=True, max_age=0,
+        s_maxage=settings.PAGE_CACHE_TIMEOUT,
+    )
+    response['Surrogate-Key'] = ' '.join(scopes)
+    return response
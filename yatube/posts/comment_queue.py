@@ -0,0 +1,204 @@
+import atexit
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.background import run
+
+from . import counters
+from .caching import bump_version, post_scope
+from .models import Comment, Post, User
+
+# Таблица очереди. `claim` — метка пачки, которую переносит процесс,
+# `claimed_at` — когда он ее взял.
+QUEUE_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS comments ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'post_id INTEGER NOT NULL, '
+    'author_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, '
+    'queued_at TEXT NOT NULL, '
+    'claim TEXT, '
+    'claimed_at REAL)',
+    'CREATE INDEX IF NOT EXISTS comments_post_author '
+    'ON comments (post_id, author_id)',
+    'CREATE INDEX IF NOT EXISTS comments_claim ON comments (claim)',
+)
+
+_local = threading.local()
+_flusher = None
+_flusher_lock = threading.Lock()
+_stopped = threading.Event()
+
+
+def _queue():
+    """Соединение потока с файлом очереди.
+
+    Режим WAL дает писать в очередь, не блокируя чтение. `synchronous`
+    остается FULL: принятый комментарий переживает и отключение питания.
+    """
+    path = settings.COMMENT_QUEUE_PATH
+    connections = _local.__dict__.setdefault('connections', {})
+    if path not in connections:
+        queue = sqlite3.connect(path, timeout=30, isolation_level=None)
+        queue.execute('PRAGMA journal_mode=WAL')
+        for statement in QUEUE_SCHEMA:
+            queue.execute(statement)
+        connections[path] = queue
+    return connections[path]
+
+
+def enqueue(post_id, author_id, text):
+    """Кладет проверенный комментарий в очередь.
+
+    Версия страницы поста меняется сразу: автор увидит свой комментарий,
+    а не ответ 304 со старой страницей.
+    """
+    _queue().execute(
+        'INSERT INTO comments (post_id, author_id, text, queued_at) '
+        'VALUES (?, ?, ?, ?)',
+        (post_id, author_id, text, timezone.now().isoformat()),
+    )
+    bump_version(post_scope(post_id))
+    start_flusher()
+
+
+def pending(post_id, author):
+    """Комментарии автора к посту, которые еще ждут переноса в базу."""
+    rows = _queue().execute(
+        'SELECT text, queued_at FROM comments '
+        'WHERE post_id = ? AND author_id = ? ORDER BY id',
+        (post_id, author.pk),
+    )
+    return [
+        Comment(
+            post_id=post_id,
+            author=author,
+            text=text,
+            pub_date=datetime.fromisoformat(queued_at),
+        )
+        for text, queued_at in rows
+    ]
+
+
+def _claim(limit):
+    """Помечает пачку своей меткой, вернет метку и строки пачки.
+
+    BEGIN IMMEDIATE сразу берет блокировку записи файла, поэтому два
+    процесса или потока не возьмут одни и те же строки. Пачку упавшего
+    процесса забирают через `COMMENT_CLAIM_TIMEOUT`.
+    """
+    claim = uuid.uuid4().hex
+    now = time.time()
+    queue = _queue()
+    queue.execute('BEGIN IMMEDIATE')
+    try:
+        queue.execute(
+            'UPDATE comments SET claim = ?, claimed_at = ? WHERE id IN ('
+            'SELECT id FROM comments '
+            'WHERE claim IS NULL OR claimed_at < ? ORDER BY id LIMIT ?)',
+            (claim, now, now - settings.COMMENT_CLAIM_TIMEOUT, limit),
+        )
+        rows = queue.execute(
+            'SELECT id, post_id, author_id, text FROM comments '
+            'WHERE claim = ? ORDER BY id',
+            (claim,),
+        ).fetchall()
+    except BaseException:
+        queue.execute('ROLLBACK')
+        raise
+    queue.execute('COMMIT')
+    return claim, rows
+
+
+def flush(limit=None):
+    """Переносит в базу пачку из очереди, вернет размер пачки.
+
+    Комментарии к удаленным постам и от удаленных авторов отбрасываются.
+    `bulk_create` не шлет сигналов, поэтому счетчики и версии страниц
+    постов меняются здесь. Дата публикации — время переноса: так
+    комментарии не появляются позади уже прочитанных курсоров. Пачка
+    удаляется из очереди после коммита в базу, и при падении между
+    ними будет перенесена повторно; при ошибке базы она возвращается
+    в очередь.
+    """
+    claim, rows = _claim(limit or settings.COMMENT_FLUSH_BATCH)
+    if not rows:
+        return 0
+    try:
+        post_ids = set(
+            Post.objects
+            .filter(pk__in={row[1] for row in rows})
+            .values_list('pk', flat=True)
+        )
+        author_ids = set(
+            User.objects
+            .filter(pk__in={row[2] for row in rows})
+            .values_list('pk', flat=True)
+        )
+        comments = [
+            Comment(post_id=post_id, author_id=author_id, text=text)
+            for _, post_id, author_id, text in rows
+            if post_id in post_ids and author_id in author_ids
+        ]
+        added = Counter(comment.post_id for comment in comments)
+        with transaction.atomic():
+            Comment.objects.bulk_create(comments)
+            for post_id, count in added.items():
+                counters.change_comments_count(post_id, count)
+    except BaseException:
+        _queue().execute(
+            'UPDATE comments SET claim = NULL, claimed_at = NULL '
+            'WHERE claim = ?',
+            (claim,),
+        )
+        raise
+    _queue().execute('DELETE FROM comments WHERE claim = ?', (claim,))
+    for post_id in added:
+        bump_version(post_scope(post_id))
+    return len(rows)
+
+
+def drain():
+    """Переносит в базу всю очередь, вернет число комментариев."""
+    total = 0
+    while True:
+        count = flush()
+        if not count:
+            return total
+        total += count
+
+
+def _flush_forever():
+    while not _stopped.wait(settings.COMMENT_FLUSH_INTERVAL):
+        run(drain)
+
+
+def _stop():
+    _stopped.set()
+    drain()
+
+
+def start_flusher():
+    """Запускает фоновый перенос очереди, если он включен.
+
+    При остановке процесса очередь дописывается в базу; остатки после
+    падения перенесет первый запуск потока.
+    """
+    global _flusher
+    if not settings.COMMENT_FLUSH_ASYNC:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_forever, name='comments', daemon=True
+            )
+            _flusher.start()
+            atexit.register(_stop)
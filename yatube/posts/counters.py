@@ -0,0 +1,100 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, UserCounters
+
+# Поля счетчиков пользователя и что они считают.
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def counters_for(user):
+    """Счетчики пользователя, для новичка без записи — нули."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return UserCounters(user=user)
+
+
+def change_user_counter(user_id, field, delta):
+    """Атомарно меняет счетчик пользователя на `delta`.
+
+    Если записи еще нет, она создается пересчетом по базе: сигнал
+    приходит после изменения, поэтому пересчет его уже учитывает.
+    При уменьшении запись не создается: удаление может идти каскадом
+    вместе с самим пользователем.
+    """
+    counters = UserCounters.objects.filter(user_id=user_id)
+    if delta < 0:
+        counters.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+        return
+    if counters.update(**{field: F(field) + delta}):
+        return
+    try:
+        with transaction.atomic():
+            recount_users([user_id])
+    except IntegrityError:
+        # Запись успел создать параллельный запрос, значит она уже
+        # посчитана вместе с нашим изменением.
+        pass
+
+
+def change_comments_count(post_id, delta):
+    """Атомарно меняет число комментариев поста на `delta`."""
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def _count_by(model, field, ids):
+    return dict(
+        model.objects
+        .filter(**{f'{field}__in': ids})
+        .values_list(field)
+        .annotate(Count('pk'))
+        .order_by()
+    )
+
+
+def recount_users(user_ids):
+    """Пересчитывает счетчики пользователей, вернет число исправленных."""
+    counts = {
+        field: _count_by(model, lookup, user_ids)
+        for field, (model, lookup) in USER_COUNTERS.items()
+    }
+    existing = UserCounters.objects.in_bulk(user_ids)
+    to_create, to_update = [], []
+    for user_id in user_ids:
+        expected = {
+            field: values.get(user_id, 0) for field, values in counts.items()
+        }
+        counters = existing.get(user_id)
+        if counters is None:
+            to_create.append(UserCounters(user_id=user_id, **expected))
+            continue
+        if any(getattr(counters, f) != v for f, v in expected.items()):
+            for field, value in expected.items():
+                setattr(counters, field, value)
+            to_update.append(counters)
+    UserCounters.objects.bulk_create(to_create)
+    UserCounters.objects.bulk_update(to_update, list(USER_COUNTERS))
+    return len(to_create) + len(to_update)
+
+
+def recount_posts(post_ids):
+    """Пересчитывает число комментариев, вернет число исправленных."""
+    comments = _count_by(Comment, 'post', post_ids)
+    to_update = []
+    for post in Post.objects.filter(pk__in=post_ids).only('comments_count'):
+        expected = comments.get(post.pk, 0)
+        if post.comments_count != expected:
+            post.comments_count = expected
+            to_update.append(post)
+    Post.objects.bulk_update(to_update, ['comments_count'])
+    return len(to_update)
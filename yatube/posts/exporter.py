@@ -0,0 +1,99 @@
+import csv
+import json
+from io import StringIO
+
+from .models import Comment, Post
+
+# Сколько строк читать из базы за один запрос.
+EXPORT_CHUNK_SIZE: int = 2000
+
+# Поля выгрузки в формате, который понимает import_posts.
+EXPORT_FIELDS = {
+    'post': {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'image': 'image',
+        'pub_date': 'pub_date',
+    },
+    'comment': {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'pub_date': 'pub_date',
+    },
+}
+EXPORT_MODELS = {'post': Post, 'comment': Comment}
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+
+def export_queryset(record_type, author=None):
+    """Записи типа `record_type`, при `author` — только его."""
+    queryset = EXPORT_MODELS[record_type].objects.all()
+    if author is not None:
+        queryset = queryset.filter(author=author)
+    return queryset
+
+
+def export_chunks(record_type, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Отдает записи списками по `chunk_size` словарей.
+
+    Листает по первичному ключу, а не OFFSET, и читает курсором через
+    `iterator()`, так что память не зависит от размера таблицы.
+    """
+    fields = EXPORT_FIELDS[record_type]
+    last_pk = 0
+    while True:
+        rows = (
+            queryset
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list(*fields.values())[:chunk_size]
+            .iterator(chunk_size=chunk_size)
+        )
+        chunk = [dict(zip(fields, row)) for row in rows]
+        if not chunk:
+            return
+        for record in chunk:
+            record['type'] = record_type
+            record['pub_date'] = record['pub_date'].isoformat()
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1]['id']
+
+
+def to_ndjson(chunks):
+    """Переводит пачки записей в строки NDJSON, одна строка на пачку."""
+    for chunk in chunks:
+        yield ''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in chunk
+        )
+
+
+def to_csv(chunks, record_type):
+    """Переводит пачки записей в CSV с заголовком."""
+    buffer = StringIO()
+    writer = csv.DictWriter(
+        buffer, fieldnames=['type', *EXPORT_FIELDS[record_type]]
+    )
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_lines(record_type, export_format, queryset,
+                 chunk_size=EXPORT_CHUNK_SIZE):
+    """Текст выгрузки по частям, готовый для потокового ответа."""
+    chunks = export_chunks(record_type, queryset, chunk_size)
+    if export_format == 'csv':
+        return to_csv(chunks, record_type)
+    return to_ndjson(chunks)
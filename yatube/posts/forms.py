@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Comment, Post
+from .uploads import check_image, downsample_image
 
 
 class PostForm(forms.ModelForm):
@@ -18,6 +20,13 @@ class PostForm(forms.ModelForm):
             'image': 'Картинка к посту.'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            check_image(image)
+            image = downsample_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,349 @@
+import csv
+import gzip
+import json
+from collections import Counter
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import explicit_pub_dates
+
+from . import timeline
+from .caching import (POSTS_SCOPE, author_scope, bump_version, bump_versions,
+                      follow_scope, group_scope, post_scope)
+from .counters import recount_posts, recount_users
+from .models import Comment, Follow, Group, Post
+from .search import get_backend
+
+User = get_user_model()
+
+# Типы записей в порядке вставки: ссылки идут только на предыдущие.
+RECORD_TYPES = ('group', 'post', 'comment', 'follow')
+
+
+class RecordError(ValueError):
+    """Запись, которую нельзя загрузить."""
+
+
+def read_records(path, record_type=None):
+    """Потоково читает записи из NDJSON или CSV, можно сжатых gzip.
+
+    Тип записи берется из поля `type`, а если его нет — из
+    `record_type`. Файл читается построчно, целиком в память не
+    попадает.
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as file_:
+        if name.endswith('.csv'):
+            rows = csv.DictReader(file_)
+        else:
+            rows = (json.loads(line) for line in file_ if line.strip())
+        for row in rows:
+            row.setdefault('type', record_type)
+            if not row['type']:
+                row['type'] = record_type
+            yield row
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value) if isinstance(value, str) else value
+    if not isinstance(date, datetime):
+        raise RecordError(f'Неверная дата: {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+class Importer:
+    """Загружает записи пачками через `bulk_create`.
+
+    Пользователи и группы ищутся по словарям `username -> id` и
+    `slug -> id`, которые читаются из базы один раз; память не растет
+    с числом строк, только с числом авторов и групп. `bulk_create` не
+    шлет сигналов, поэтому после загрузки `finish()` пересчитывает
+    счетчики, поисковый индекс и ленты подписок. Что задела загрузка,
+    он находит по диапазонам ключей: новые строки идут после
+    запомненных на старте максимальных id.
+    """
+
+    def __init__(self, batch_size=5000, create_users=False):
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.buffers = {record_type: [] for record_type in RECORD_TYPES}
+        self.pending_users = set()
+        self.loaded = Counter()
+        self.skipped = Counter()
+        self.errors = []
+        self.posts_before = self._max_pk(Post)
+        self.comments_before = self._max_pk(Comment)
+        self.follows_before = self._max_pk(Follow)
+        self.first_explicit_post = None
+
+    @staticmethod
+    def _max_pk(model):
+        return model.objects.aggregate(pk=Max('pk'))['pk'] or 0
+
+    def add(self, record):
+        record_type = record.get('type')
+        if record_type not in self.buffers:
+            self.skip(record_type, f'Неизвестный тип записи: {record_type}')
+            return
+        for field in ('author', 'user'):
+            username = record.get(field)
+            if username and username not in self.users:
+                self.pending_users.add(username)
+        buffer = self.buffers[record_type]
+        buffer.append(record)
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def skip(self, record_type, error):
+        self.skipped[record_type] += 1
+        if len(self.errors) < 10:
+            self.errors.append(error)
+
+    def flush(self):
+        """Вставляет все накопленные записи одной транзакцией.
+
+        Если база отвергла пачку (например, повторный явный id поста),
+        транзакция откатывается целиком, а ошибка называет тип и первую
+        запись пачки.
+        """
+        loaded = self.loaded.copy()
+        record_type = None
+        try:
+            with transaction.atomic(), explicit_pub_dates(Post, Comment):
+                self._create_users()
+                for record_type in RECORD_TYPES:
+                    records = self.buffers[record_type]
+                    if records:
+                        getattr(self, f'_insert_{record_type}s')(records)
+        except IntegrityError as error:
+            self.loaded = loaded
+            records = self.buffers[record_type]
+            raise RecordError(
+                f'{record_type}: пачка из {len(records)} записей с первой '
+                f'{records[0]!r} не загружена: {error}'
+            ) from error
+        finally:
+            self.buffers = {record_type: [] for record_type in RECORD_TYPES}
+
+    def _create_users(self):
+        if not self.pending_users:
+            return
+        if self.create_users:
+            # У загруженных пользователей нет пароля, войти они не могут.
+            password = make_password(None)
+            User.objects.bulk_create(
+                [
+                    User(username=username, password=password)
+                    for username in self.pending_users
+                ],
+                ignore_conflicts=True,
+            )
+            self.users.update(
+                User.objects
+                .filter(username__in=self.pending_users)
+                .values_list('username', 'pk')
+            )
+        self.pending_users = set()
+
+    def _build(self, record_type, records, build):
+        objects = []
+        for record in records:
+            try:
+                objects.append(build(record))
+            except (RecordError, KeyError, TypeError, ValueError) as error:
+                self.skip(record_type, f'{record_type}: {error!r}')
+        return objects
+
+    def _user_id(self, username):
+        if username not in self.users:
+            raise RecordError(f'Нет пользователя {username!r}')
+        return self.users[username]
+
+    def _insert_groups(self, records):
+        groups = self._build('group', records, lambda record: Group(
+            title=record['title'],
+            slug=record['slug'],
+            description=record.get('description') or '',
+        ))
+        slugs = {group.slug for group in groups}
+        existing = set(
+            Group.objects.filter(slug__in=slugs).values_list('slug', flat=True)
+        )
+        Group.objects.bulk_create(groups, ignore_conflicts=True)
+        self.groups.update(
+            Group.objects.filter(slug__in=slugs).values_list('slug', 'pk')
+        )
+        # `ignore_conflicts` молча пропускает существующие группы и
+        # повторы внутри пачки, считаем только вставленные.
+        inserted = slugs - existing
+        self.loaded['group'] += len(inserted)
+        self.skipped['group'] += len(groups) - len(inserted)
+
+    def _build_post(self, record):
+        slug = record.get('group')
+        if slug and slug not in self.groups:
+            raise RecordError(f'Нет группы {slug!r}')
+        post = Post(
+            text=record['text'],
+            author_id=self._user_id(record['author']),
+            group_id=self.groups.get(slug) if slug else None,
+            image=record.get('image') or '',
+            pub_date=parse_date(record.get('pub_date')),
+        )
+        if record.get('id'):
+            post.pk = int(record['id'])
+        return post
+
+    def _insert_posts(self, records):
+        posts = self._build('post', records, self._build_post)
+        Post.objects.bulk_create(posts)
+        for post in posts:
+            if post.pk is not None and (
+                self.first_explicit_post is None
+                or post.pk < self.first_explicit_post
+            ):
+                self.first_explicit_post = post.pk
+        self.loaded['post'] += len(posts)
+
+    def _insert_comments(self, records):
+        comments = self._build('comment', records, lambda record: Comment(
+            post_id=int(record['post']),
+            author_id=self._user_id(record['author']),
+            text=record['text'],
+            pub_date=parse_date(record.get('pub_date')),
+        ))
+        existing = set(
+            Post.objects
+            .filter(pk__in={comment.post_id for comment in comments})
+            .values_list('pk', flat=True)
+        )
+        valid = []
+        for comment in comments:
+            if comment.post_id in existing:
+                valid.append(comment)
+            else:
+                self.skip('comment', f'Нет поста {comment.post_id}')
+        Comment.objects.bulk_create(valid)
+        self.loaded['comment'] += len(valid)
+
+    def _build_follow(self, record):
+        follow = Follow(
+            user_id=self._user_id(record['user']),
+            author_id=self._user_id(record['author']),
+        )
+        if follow.user_id == follow.author_id:
+            raise RecordError('Подписка на самого себя')
+        return follow
+
+    def _insert_follows(self, records):
+        follows = self._build('follow', records, self._build_follow)
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        self.loaded['follow'] += len(follows)
+
+    def finish(self, rebuild_timelines=True):
+        """Досылает остаток и пересобирает то, что ведут сигналы."""
+        self.flush()
+        if connection.vendor == 'postgresql':
+            self._reset_sequences()
+        self._recount()
+        get_backend(connection.alias).reindex(self._new_posts())
+        if rebuild_timelines:
+            self._rebuild_timelines()
+        self._bump_pages()
+
+    def _new_posts(self):
+        # Посты с явными id могли встать ниже старого максимума:
+        # лишние старые посты в диапазоне пересчитываются безвредно.
+        first_post = self.posts_before + 1
+        if self.first_explicit_post is not None:
+            first_post = min(first_post, self.first_explicit_post)
+        return Post.objects.filter(pk__gte=first_post)
+
+    def _new_comments(self):
+        return Comment.objects.filter(pk__gt=self.comments_before)
+
+    def _new_follows(self):
+        return Follow.objects.filter(pk__gt=self.follows_before)
+
+    def _batches(self, queryset, field):
+        """Различные значения поля выборки пачками по `batch_size`."""
+        values = (
+            queryset
+            .exclude(**{f'{field}__isnull': True})
+            .order_by(field)
+            .values_list(field, flat=True)
+            .distinct()
+            .iterator()
+        )
+        batch = []
+        for value in values:
+            batch.append(value)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _touched(self, field):
+        """Пачки значений `field` у новых постов и подписок.
+
+        `field` — путь от пользователя: `id` или `username`.
+        """
+        yield from self._batches(self._new_posts(), f'author__{field}')
+        for side in ('user', 'author'):
+            yield from self._batches(self._new_follows(), f'{side}__{field}')
+
+    def _recount(self):
+        """Пересчитывает счетчики только задетых загрузкой строк.
+
+        У новых постов без комментариев счетчик и так нулевой, поэтому
+        пересчитываются только посты, к которым пришли комментарии.
+        Автор и читатель, попавшие в несколько выборок, пересчитываются
+        повторно, но результат тот же.
+        """
+        for user_ids in self._touched('id'):
+            recount_users(user_ids)
+        for post_ids in self._batches(self._new_comments(), 'post_id'):
+            recount_posts(post_ids)
+
+    def _rebuild_timelines(self):
+        follows = Follow.objects.filter(
+            Q(author_id__in=self._new_posts().values('author_id'))
+            | Q(pk__gt=self.follows_before)
+        )
+        timeline.backfill_follows(follows)
+        for user_ids in self._batches(follows, 'user_id'):
+            bump_versions(follow_scope(user_id) for user_id in user_ids)
+
+    def _bump_pages(self):
+        """Сбрасывает версии страниц, которые задела загрузка."""
+        bump_version(POSTS_SCOPE)
+        for usernames in self._touched('username'):
+            bump_versions(author_scope(username) for username in usernames)
+        for slugs in self._batches(self._new_posts(), 'group__slug'):
+            bump_versions(group_scope(slug) for slug in slugs)
+        for post_ids in self._batches(self._new_comments(), 'post_id'):
+            bump_versions(post_scope(post_id) for post_id in post_ids)
+
+    def _reset_sequences(self):
+        # Посты с явными id не двигают последовательность PostgreSQL.
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment, Follow, Group, User]
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from posts.benchmarks import bench_database, measure_comment_writes
+from posts.models import Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность add_comment при одновременных '
+        'авторах: запись сразу в базу и через очередь write-behind.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--writers', type=int, default=8,
+            help='Сколько авторов пишут одновременно, каждый в своем потоке.',
+        )
+        parser.add_argument(
+            '--comments', type=int, default=50,
+            help='Сколько комментариев отправляет каждый автор.',
+        )
+        parser.add_argument('--json', help='Куда сохранить результаты.')
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory, bench_database(
+            log=self.stdout.write,
+            name=os.path.join(directory, 'bench.sqlite3'),
+            users=options['writers'],
+            posts=options['writers'],
+            groups=1,
+            follows=1,
+        ), override_settings(
+            COMMENT_QUEUE_PATH=os.path.join(directory, 'queue.sqlite3'),
+        ):
+            users = list(User.objects.order_by('pk')[:options['writers']])
+            post = Post.objects.order_by('pk').first()
+            for mode, write_behind in (('sync', False), ('queue', True)):
+                results[mode] = measure_comment_writes(
+                    post, users, options['comments'], write_behind
+                )
+        self.stdout.write(
+            f'{"режим":<8}{"сохранено":>11}{"ошибок":>8}'
+            f'{"прием/с":>10}{"всего/с":>10}{"всего_ms":>11}'
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{mode:<8}{result["saved"]:>11}{result["errors"]:>8}'
+                f'{result["accept_per_s"]:>10}{result["total_per_s"]:>10}'
+                f'{result["total_ms"]:>11}'
+            )
+        if options['json']:
+            with open(options['json'], 'w') as file_:
+                json.dump(results, file_, ensure_ascii=False, indent=2)
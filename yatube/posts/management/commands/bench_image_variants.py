@@ -0,0 +1,75 @@
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageFilter
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts.thumbnails import supported_formats, variant_geometry
+
+
+def sample_image(width, height):
+    """Шумная картинка, похожая на фото по сжимаемости."""
+    noise = Image.effect_noise((width, height), 64).convert('RGB')
+    gradient = Image.linear_gradient('L').resize((width, height))
+    image = Image.merge('RGB', (gradient, noise.getchannel(0), gradient))
+    return image.filter(ImageFilter.GaussianBlur(2))
+
+
+def crop_to_ratio(image, ratio):
+    width, height = image.size
+    if width / height > ratio:
+        new_width = round(height * ratio)
+        left = (width - new_width) // 2
+        return image.crop((left, 0, left + new_width, height))
+    new_height = round(width / ratio)
+    top = (height - new_height) // 2
+    return image.crop((0, top, width, top + new_height))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает размер и время кодирования вариантов картинки '
+        'по форматам и ширинам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--image', help='Исходная картинка, по умолчанию синтетическая.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Сколько раз кодировать каждый вариант.',
+        )
+
+    def handle(self, *args, image=None, repeat, **options):
+        source = Image.open(image) if image else sample_image(3000, 2000)
+        source = crop_to_ratio(
+            source.convert('RGB'), settings.POST_IMAGE_RATIO
+        )
+        quality = sorl_settings.THUMBNAIL_QUALITY
+        results = []
+        for format_ in supported_formats():
+            for width in settings.POST_IMAGE_WIDTHS:
+                size = tuple(map(int, variant_geometry(width).split('x')))
+                resized = source.resize(size, Image.LANCZOS)
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    buffer = BytesIO()
+                    resized.save(buffer, format_, quality=quality)
+                elapsed = (time.perf_counter() - started) / repeat
+                results.append((format_, width, buffer.tell(), elapsed))
+        baseline = next(
+            size for format_, width, size, _ in results
+            if (format_, width) == ('JPEG', 960)
+        )
+        self.stdout.write(
+            f'{"формат":<6} {"ширина":>6} {"байт":>9} {"к JPEG 960":>10} '
+            f'{"мс":>8}'
+        )
+        for format_, width, size, elapsed in results:
+            self.stdout.write(
+                f'{format_:<6} {width:>6} {size:>9} '
+                f'{size / baseline:>10.0%} {elapsed * 1000:>8.1f}'
+            )
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts.benchmarks import measure_links, page_links
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает построение адресов страницы ленты через reverse() и '
+        'через post_url().'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int,
+            help='Постов на странице, по умолчанию POSTS_ON_PAGE.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=1000,
+            help='Сколько раз строить адреса страницы.',
+        )
+        parser.add_argument('--json', help='Куда сохранить результаты.')
+
+    def handle(self, *args, **options):
+        result = measure_links(
+            page_links(options['size']), options['repeat']
+        )
+        self.stdout.write(f'Адресов на странице: {result["links"]}')
+        for label, key in (
+            ('reverse()', 'reverse_us'),
+            ('post_url(), пустая память', 'cold_us'),
+            ('post_url(), заполненная', 'warm_us'),
+        ):
+            self.stdout.write(f'{label:<28}{result[key]:>9} мкс')
+        if options['json']:
+            with open(options['json'], 'w') as file_:
+                json.dump(result, file_, ensure_ascii=False, indent=2)
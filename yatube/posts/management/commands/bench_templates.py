@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from posts.benchmarks import (TEMPLATE_MODES, bench_database,
+                              run_template_modes, view_cases)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендера лент без кэша шаблонов, с кэширующим '
+        'загрузчиком и с прогретым кэшем, с разбивкой по шаблонам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--follows', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз рендерить каждую страницу в каждом режиме.',
+        )
+        parser.add_argument(
+            '--top', type=int, default=5,
+            help='Сколько самых долгих шаблонов показать.',
+        )
+        parser.add_argument('--json', help='Куда сохранить результаты.')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую базу и не наполнять ее повторно.',
+        )
+
+    def handle(self, *args, **options):
+        with bench_database(
+            keepdb=options['keepdb'],
+            log=self.stdout.write,
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            follows=options['follows'],
+            seed=options['seed'],
+        ):
+            cases = [
+                case for case in view_cases()
+                if not case[0].startswith('api_')
+            ]
+            results = run_template_modes(Client(), cases, options['repeat'])
+        self.stdout.write(
+            f'{"страница":<14}{"режим":<11}{"первый_ms":>11}{"рендер_ms":>11}'
+        )
+        for (name, mode), result in results.items():
+            self.stdout.write(
+                f'{name:<14}{mode:<11}'
+                f'{result["first_ms"]:>11}{result["render_ms"]:>11}'
+            )
+        for mode in TEMPLATE_MODES:
+            self.stdout.write(f'\nСобственное время шаблонов index, {mode}:')
+            top = list(results['index', mode]['templates'].items())
+            for template, ms in top[:options['top']]:
+                self.stdout.write(f'  {template:<40}{ms:>9} мс')
+        if options['json']:
+            with open(options['json'], 'w') as file_:
+                json.dump(
+                    [
+                        {'page': name, 'mode': mode, **result}
+                        for (name, mode), result in results.items()
+                    ],
+                    file_, ensure_ascii=False, indent=2,
+                )
@@ -0,0 +1,79 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from posts.benchmarks import (BUDGETS, bench_database, over_budget, run_cases,
+                              view_cases)
+
+METRICS = ('queries', 'sql_ms', 'render_ms', 'cpu_ms', 'total_ms')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет число запросов и время страниц постов на тестовой базе '
+        'боевого объема и сверяет их с бюджетами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз запрашивать каждую страницу.',
+        )
+        parser.add_argument(
+            '--budgets', help='JSON с бюджетами вместо встроенных.'
+        )
+        parser.add_argument('--json', help='Куда сохранить результаты.')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую базу и не наполнять ее повторно.',
+        )
+
+    def handle(self, *args, **options):
+        budgets = BUDGETS
+        if options['budgets']:
+            with open(options['budgets']) as file_:
+                budgets = json.load(file_)
+        with bench_database(
+            keepdb=options['keepdb'],
+            log=self.stdout.write,
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            follows=options['follows'],
+            seed=options['seed'],
+        ):
+            results = run_cases(Client(), view_cases(), options['repeat'])
+        self.stdout.write(
+            f'{"страница":<18}' + ''.join(f'{m:>11}' for m in METRICS)
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<18}'
+                + ''.join(f'{result[m]:>11}' for m in METRICS)
+            )
+        if options['json']:
+            with open(options['json'], 'w') as file_:
+                json.dump(
+                    {'options': options_summary(options), 'results': results},
+                    file_, ensure_ascii=False, indent=2,
+                )
+        violations = over_budget(results, budgets)
+        if violations:
+            raise CommandError('Бюджет превышен: ' + '; '.join(
+                f'{name} {metric} {value} > {limit}'
+                for name, metric, value, limit in violations
+            ))
+
+
+def options_summary(options):
+    keys = ('users', 'posts', 'groups', 'follows', 'seed', 'repeat')
+    return {key: options[key] for key in keys}
@@ -0,0 +1,58 @@
+import gzip
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import (EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORT_MODELS,
+                            export_lines, export_queryset)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты или комментарии в NDJSON или CSV. '
+        'Файл с окончанием .gz сжимается на лету.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('record_type', choices=list(EXPORT_MODELS))
+        parser.add_argument(
+            '--format', choices=EXPORT_FORMATS, default='ndjson'
+        )
+        parser.add_argument('--author', help='Выгрузить записи одного автора.')
+        parser.add_argument(
+            '--output', help='Файл выгрузки, по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help='Сколько строк читать из базы за один запрос.',
+        )
+
+    def handle(self, record_type, **options):
+        author = None
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(f'Нет автора {options["author"]}.')
+        lines = export_lines(
+            record_type,
+            options['format'],
+            export_queryset(record_type, author),
+            options['chunk_size'],
+        )
+        output = options['output']
+        if not output:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        started = time.perf_counter()
+        opener = gzip.open if output.endswith('.gz') else open
+        with opener(output, 'wt', encoding='utf-8', newline='') as file_:
+            for line in lines:
+                file_.write(line)
+        self.stderr.write(
+            f'Выгружено в {output} за '
+            f'{time.perf_counter() - started:.1f} с.'
+        )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from posts.comment_queue import drain
+
+
+class Command(BaseCommand):
+    help = 'Переносит в базу все комментарии из очереди write-behind.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Перенесено комментариев: {drain()}.')
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import RECORD_TYPES, Importer, RecordError, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии и подписки из файлов NDJSON '
+        'или CSV (можно .gz) пачками через bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Файлы с записями.')
+        parser.add_argument(
+            '--type', choices=RECORD_TYPES,
+            help='Тип записей, у которых нет поля type (например, в CSV).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько записей одного типа вставлять за раз.',
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать неизвестных авторов без пароля.',
+        )
+        parser.add_argument(
+            '--skip-timeline', action='store_true',
+            help='Не пересобирать ленты подписок после загрузки.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        importer = Importer(
+            batch_size=options['batch_size'],
+            create_users=options['create_users'],
+        )
+        rows = 0
+        failure = None
+        try:
+            for path in options['paths']:
+                for record in read_records(path, options['type']):
+                    importer.add(record)
+                    rows += 1
+            importer.finish(rebuild_timelines=not options['skip_timeline'])
+        except (OSError, RecordError, ValueError) as error:
+            failure = error
+        elapsed = time.perf_counter() - started
+        # Итог печатается и после сбоя: видно, что успело загрузиться.
+        for record_type in RECORD_TYPES:
+            self.stdout.write(
+                f'{record_type:<8} загружено {importer.loaded[record_type]}, '
+                f'пропущено {importer.skipped[record_type]}'
+            )
+        for error in importer.errors:
+            self.stderr.write(error)
+        self.stdout.write(
+            f'Строк: {rows} за {elapsed:.1f} с '
+            f'({rows / max(elapsed, 1e-9):.0f} строк/с).'
+        )
+        if failure is not None:
+            raise CommandError(
+                f'Загрузка прервана после {rows} строк: {failure}'
+            )
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_posts, recount_users
+from posts.models import Post
+
+User = get_user_model()
+
+
+def id_batches(queryset, batch_size):
+    """Отдает первичные ключи пачками, листая по ключу, а не OFFSET."""
+    last_pk = 0
+    while True:
+        batch = list(
+            queryset
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики постов и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей пересчитывать за один запрос.',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        users = sum(
+            recount_users(batch)
+            for batch in id_batches(User.objects.all(), batch_size)
+        )
+        posts = sum(
+            recount_posts(batch)
+            for batch in id_batches(Post.objects.all(), batch_size)
+        )
+        self.stdout.write(
+            f'Исправлено счетчиков: пользователей {users}, постов {posts}.'
+        )
@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:10
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    # Перед уникальным ограничением оставляем одну подписку на пару.
+    # Группировка находит только повторы, и DELETE идет лишь для них.
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = (
+        Follow.objects
+        .values('user', 'author')
+        .annotate(count=Count('id'), first_id=Min('id'))
+        .filter(count__gt=1)
+        .values_list('user', 'author', 'first_id')
+        .order_by()
+    )
+    for user_id, author_id, first_id in list(duplicates):
+        (
+            Follow.objects
+            .filter(user_id=user_id, author_id=author_id)
+            .exclude(id=first_id)
+            .delete()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_auto_20220523_0740'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'pub_date'], name='comment_post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='post_group_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
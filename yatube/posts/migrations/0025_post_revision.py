@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='revision',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Метка правки, входит в ключ кэша готового HTML поста', verbose_name='Ревизия'),
+        ),
+    ]
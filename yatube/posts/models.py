@@ -34,15 +34,65 @@ class Post(PubDateModel):
         blank=True,
         null=True,
     )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False,
+        help_text='Число комментариев к посту',
+    )
+    revision = models.BigIntegerField(
+        'Ревизия',
+        default=0,
+        editable=False,
+        help_text='Метка правки, входит в ключ кэша готового HTML поста',
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('pub_date',), name='post_pub_date_idx'),
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('group', 'pub_date'),
+                name='post_group_pub_date_idx',
+            ),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
         return self.text[:LIMIT_STR]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Группа на момент чтения: перенос поста виден без запроса.
+        if 'group_id' in post.__dict__:
+            post._loaded_group_id = post.group_id
+        return post
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        """Сохраняет пост, не перезаписывая счетчик комментариев.
+
+        Счетчик меняют только атомарные UPDATE из `counters`, а в
+        загруженном объекте он может устареть: полная запись строки
+        затерла бы комментарии, добавленные после загрузки.
+        """
+        if update_fields is None and not (
+            self._state.adding or force_insert
+        ):
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count'
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+        if update_fields is None or 'group' in update_fields:
+            self._loaded_group_id = self.group_id
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -91,6 +141,12 @@ class Comment(PubDateModel):
     )
 
     class Meta:
+        indexes = (
+            models.Index(
+                fields=('post', 'pub_date'),
+                name='comment_post_pub_date_idx',
+            ),
+        )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -114,5 +170,107 @@ class Follow(models.Model):
     )
 
     class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow',
+            ),
+        )
         verbose_name = 'Подписчик'
         verbose_name_plural = 'Подписчики'
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок пользователя.
+
+    Запись появляется у каждого подписчика при публикации поста автора,
+    поэтому лента подписок читается одним проходом по индексу
+    `(user, pub_date)`.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+        help_text='Владелец ленты',
+    )
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+        help_text='Пост в ленте',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+        help_text='Автор поста',
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации',
+        help_text='Дата публикации поста',
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_post',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date', 'post'),
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx',
+            ),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+
+class UserCounters(models.Model):
+    """Счетчики пользователя, чтобы не считать их агрегатами.
+
+    Поддерживаются сигналами, расхождения чинит команда
+    `recount_counters`.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+        help_text='Владелец счетчиков',
+    )
+    posts_count = models.PositiveIntegerField(
+        'Постов',
+        default=0,
+        help_text='Число постов автора',
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        help_text='Число подписчиков автора',
+    )
+    following_count = models.PositiveIntegerField(
+        'Подписок',
+        default=0,
+        help_text='Число авторов, на которых подписан пользователь',
+    )
+
+    class Meta:
+        indexes = (
+            # По нему `pull_author_ids()` находит популярных авторов.
+            models.Index(
+                fields=('followers_count',),
+                name='counters_followers_idx',
+            ),
+        )
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
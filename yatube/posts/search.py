@@ -0,0 +1,261 @@
+import re
+
+from django.db import connections, router
+
+from .models import Post
+
+# Таблица полнотекстового индекса SQLite (FTS5).
+FTS_TABLE: str = 'posts_post_fts'
+# Сколько постов переиндексировать за один проход.
+REINDEX_BATCH_SIZE: int = 1000
+
+VOWELS: str = 'аеиоуыэюя'
+RV = re.compile(f'^(.*?[{VOWELS}])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых'
+    r'|ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем'
+    r'|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL = re.compile(f'[^{VOWELS}][{VOWELS}].*ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile(r'[а-я]')
+
+
+def stem(word):
+    """Основа русского слова по алгоритму Портера (Snowball)."""
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if not CYRILLIC.search(word) or not match:
+        return word
+    prefix, rv = match.groups()
+    stripped = PERFECTIVE_GERUND.sub('', rv, 1)
+    if stripped == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        stripped = ADJECTIVE.sub('', rv, 1)
+        if stripped != rv:
+            rv = PARTICIPLE.sub('', stripped, 1)
+        else:
+            stripped = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if stripped == rv else stripped
+    else:
+        rv = stripped
+    rv = re.sub('и$', '', rv)
+    if DERIVATIONAL.search(rv):
+        rv = re.sub('ость?$', '', rv)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = re.sub('нн$', 'н', rv)
+    return prefix + rv
+
+
+def normalize(text):
+    """Текст как строка основ слов через пробел."""
+    return ' '.join(stem(word) for word in WORD.findall(text))
+
+
+class SQLiteSearchBackend:
+    """Индекс FTS5 по основам слов, ранжирование по bm25."""
+
+    def __init__(self, using):
+        self.using = using
+
+    def index(self, post):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                [post.pk, normalize(post.text)],
+            )
+
+    def remove(self, post_id):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def reindex(self, queryset, batch_size=REINDEX_BATCH_SIZE):
+        """Переиндексирует посты выборки пачками, листая по ключу."""
+        last_pk = 0
+        while True:
+            rows = list(
+                queryset
+                .using(self.using)
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'text')[:batch_size]
+            )
+            if not rows:
+                return
+            with connections[self.using].cursor() as cursor:
+                cursor.executemany(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                    [(pk,) for pk, _ in rows],
+                )
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                    [(pk, normalize(text)) for pk, text in rows],
+                )
+            last_pk = rows[-1][0]
+
+    def match_expression(self, query):
+        # Основы берем в кавычки, чтобы запрос не ломал синтаксис FTS5.
+        # Индекс тоже хранит основы, поэтому другие формы слова находятся
+        # точным совпадением, а префикс зацепил бы чужие слова.
+        stems = normalize(query).split()
+        return ' AND '.join(f'"{word}"' for word in stems)
+
+    def search(self, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return Post.objects.none()
+        return RankedResults(expression, self.using)
+
+    def search_ids(self, query, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        return RankedResults(expression, self.using).ids(0, limit)
+
+
+class RankedResults:
+    """Результаты FTS5 в порядке релевантности для `Paginator`.
+
+    Срез выбирает из индекса только нужную страницу идентификаторов,
+    а посты подгружаются одним запросом.
+    """
+
+    def __init__(self, expression, using):
+        self.expression = expression
+        self.using = using
+
+    def count(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} '
+                f'MATCH %s',
+                [self.expression],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def ids(self, offset, limit):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.expression, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        offset = key.start or 0
+        ids = self.ids(offset, key.stop - offset)
+        posts = (
+            Post.objects
+            .using(self.using)
+            .select_related('author', 'group')
+            .in_bulk(ids)
+        )
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+class PostgresSearchBackend:
+    """Поиск по GIN-индексу `to_tsvector('russian', text)`.
+
+    Индекс выражения обновляет сама база, синхронизация не нужна.
+    """
+
+    def __init__(self, using):
+        self.using = using
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def reindex(self, queryset, batch_size=REINDEX_BATCH_SIZE):
+        pass
+
+    def search(self, query):
+        from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                                    SearchVector)
+        vector = SearchVector('text', config='russian')
+        search_query = SearchQuery(query, config='russian')
+        return (
+            Post.objects
+            .using(self.using)
+            .select_related('author', 'group')
+            .annotate(search=vector)
+            .filter(search=search_query)
+            .annotate(rank=SearchRank(vector, search_query))
+            .order_by('-rank', '-pub_date')
+        )
+
+    def search_ids(self, query, limit):
+        return list(self.search(query).values_list('pk', flat=True)[:limit])
+
+
+class SimpleSearchBackend:
+    """Запасной поиск подстрокой для остальных баз."""
+
+    def __init__(self, using):
+        self.using = using
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def reindex(self, queryset, batch_size=REINDEX_BATCH_SIZE):
+        pass
+
+    def search(self, query):
+        return (
+            Post.objects
+            .using(self.using)
+            .select_related('author', 'group')
+            .filter(text__icontains=query)
+        )
+
+    def search_ids(self, query, limit):
+        return list(self.search(query).values_list('pk', flat=True)[:limit])
+
+
+def get_backend(using=None):
+    """Поисковый бэкенд для базы `using`.
+
+    По умолчанию — база, с которой роутер читает посты: в view с
+    `read_replica` это реплика. Индекс меняют с алиасом базы записи.
+    """
+    if using is None:
+        using = router.db_for_read(Post)
+    vendor = connections[using].vendor
+    if vendor == 'sqlite':
+        return SQLiteSearchBackend(using)
+    if vendor == 'postgresql':
+        return PostgresSearchBackend(using)
+    return SimpleSearchBackend(using)
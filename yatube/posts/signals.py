@@ -0,0 +1,300 @@
+from django.core.cache import cache
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import counters, timeline
+from .articles import article_key, new_revision, revise_posts
+from .caching import (POST_AUTHOR_KEY, POSTS_SCOPE, author_scope,
+                      bump_version, follow_scope, group_scope, post_scope)
+from .models import Comment, Follow, Group, Post, User
+from .search import get_backend
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    """Новый пост попадает в ленты подписчиков автора."""
+    if created and not raw:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    """После подписки в ленту добавляются последние посты автора."""
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """После отписки посты автора убираются из ленты."""
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def posts_changed(sender, **kwargs):
+    """Изменение поста или группы сбрасывает кэш лент."""
+    bump_version(POSTS_SCOPE)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follows_changed(sender, instance, **kwargs):
+    """Подписка или отписка сбрасывает кэш ленты подписок читателя."""
+    bump_version(follow_scope(instance.user_id))
+
+
+def _related_value(instance, field, attr):
+    """Поле связанного объекта: из загруженного или одним запросом."""
+    descriptor = getattr(type(instance), field)
+    if descriptor.is_cached(instance):
+        return getattr(getattr(instance, field), attr)
+    model = descriptor.field.related_model
+    return (
+        model.objects
+        .filter(pk=getattr(instance, f'{field}_id'))
+        .values_list(attr, flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_pages_changed(sender, instance, raw=False, **kwargs):
+    """Пост меняет свою страницу, профиль автора и страницу группы."""
+    if raw:
+        return
+    bump_version(post_scope(instance.pk))
+    username = _related_value(instance, 'author', 'username')
+    if username is not None:
+        bump_version(author_scope(username))
+    if instance.group_id:
+        slug = _related_value(instance, 'group', 'slug')
+        if slug is not None:
+            bump_version(group_scope(slug))
+
+
+@receiver(pre_save, sender=Post)
+def post_regrouped(sender, instance, raw=False, **kwargs):
+    """Перенос поста в другую группу меняет и страницу старой группы.
+
+    Группу на момент чтения помнит `Post.from_db`, и база читается,
+    только если пост правда перенесли.
+    """
+    if raw or instance._state.adding:
+        return
+    if not hasattr(instance, '_loaded_group_id'):
+        old_group_id = (
+            Post.objects
+            .filter(pk=instance.pk)
+            .values_list('group_id', flat=True)
+            .first()
+        )
+    else:
+        old_group_id = instance._loaded_group_id
+    if old_group_id is None or old_group_id == instance.group_id:
+        return
+    old_slug = (
+        Group.objects
+        .filter(pk=old_group_id)
+        .values_list('slug', flat=True)
+        .first()
+    )
+    if old_slug:
+        bump_version(group_scope(old_slug))
+
+
+@receiver(pre_save, sender=Group)
+def group_reslugging(sender, instance, raw=False, **kwargs):
+    """Запоминает адрес группы до правки: его страницу тоже сбросить."""
+    instance._old_slug = None
+    if not raw and not instance._state.adding:
+        instance._old_slug = (
+            Group.objects
+            .filter(pk=instance.pk)
+            .values_list('slug', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_page_changed(sender, instance, raw=False, **kwargs):
+    """Изменение группы меняет ее страницу, в том числе по старому адресу."""
+    if raw:
+        return
+    bump_version(group_scope(instance.slug))
+    old_slug = getattr(instance, '_old_slug', None)
+    if old_slug and old_slug != instance.slug:
+        bump_version(group_scope(old_slug))
+
+
+def _group_posts_changed(group):
+    """Меняет версии страниц постов группы и профилей их авторов.
+
+    На них есть название группы и ссылка на нее.
+    """
+    authors = set()
+    posts = (
+        Post.objects
+        .filter(group=group)
+        .values_list('pk', 'author__username')
+        .iterator()
+    )
+    for post_id, username in posts:
+        bump_version(post_scope(post_id))
+        authors.add(username)
+    for username in authors:
+        bump_version(author_scope(username))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def post_commented(sender, instance, raw=False, **kwargs):
+    """Комментарий меняет страницу поста."""
+    if not raw:
+        bump_version(post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def profiles_followed(sender, instance, raw=False, **kwargs):
+    """Подписка меняет счетчики и кнопку в профилях автора и читателя."""
+    if not raw:
+        for field in ('author', 'user'):
+            username = _related_value(instance, field, 'username')
+            if username is not None:
+                bump_version(author_scope(username))
+
+
+@receiver(post_save, sender=Post)
+def post_counted(sender, instance, created, raw=False, **kwargs):
+    """Счетчики постов автора ведутся без COUNT(*) на страницах."""
+    if created and not raw:
+        counters.change_user_counter(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncounted(sender, instance, **kwargs):
+    """Удаленный пост вычитается из счетчика автора."""
+    counters.change_user_counter(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_counted(sender, instance, created, raw=False, **kwargs):
+    """Подписка меняет счетчики автора и читателя."""
+    if created and not raw:
+        counters.change_user_counter(instance.author_id, 'followers_count', 1)
+        counters.change_user_counter(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_uncounted(sender, instance, **kwargs):
+    """Отписка меняет счетчики автора и читателя."""
+    counters.change_user_counter(instance.author_id, 'followers_count', -1)
+    counters.change_user_counter(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_counted(sender, instance, created, raw=False, **kwargs):
+    """Новый комментарий увеличивает счетчик поста."""
+    if created and not raw:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncounted(sender, instance, **kwargs):
+    """Удаленный комментарий уменьшает счетчик поста."""
+    counters.change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, raw=False, using=None, **kwargs):
+    """Текст поста переиндексируется для полнотекстового поиска."""
+    if not raw:
+        get_backend(using).index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, using=None, **kwargs):
+    """Удаленный пост убирается из поискового индекса."""
+    get_backend(using).remove(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def post_revised(sender, instance, raw=False, **kwargs):
+    """Правка поста меняет ревизию, а с ней ключ его готового HTML."""
+    if not raw and not instance._state.adding:
+        instance.revision = new_revision(instance.revision)
+
+
+@receiver(post_delete, sender=Post)
+def post_article_dropped(sender, instance, **kwargs):
+    """Готовый HTML удаленного поста больше не нужен."""
+    cache.delete(article_key(instance))
+
+
+@receiver(post_save, sender=Group)
+def group_articles_revised(sender, instance, created, raw=False, **kwargs):
+    """В HTML постов есть ссылка на группу, правка группы его меняет."""
+    if not created and not raw:
+        revise_posts(group=instance)
+        _group_posts_changed(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def group_articles_orphaned(sender, instance, **kwargs):
+    """Посты удаленной группы теряют ссылку на нее."""
+    revise_posts(group=instance)
+    _group_posts_changed(instance)
+
+
+@receiver(pre_save, sender=User)
+def author_renaming(sender, instance, raw=False, update_fields=None,
+                    **kwargs):
+    """Запоминает, сменились ли имена автора, которые есть в HTML постов.
+
+    Вход пользователя сохраняет только `last_login`, и имена не
+    проверяются.
+    """
+    names = ('username', 'first_name', 'last_name')
+    instance._renamed = False
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(names):
+        return
+    old = User.objects.filter(pk=instance.pk).values_list(*names).first()
+    new = tuple(getattr(instance, name) for name in names)
+    instance._renamed = old is not None and old != new
+    if instance._renamed:
+        instance._old_username = old[0]
+
+
+@receiver(post_save, sender=User)
+def author_articles_revised(sender, instance, **kwargs):
+    """После смены имени автора его посты рендерятся заново.
+
+    Имя автора есть на страницах его постов и постов, которые он
+    комментировал. Их версии меняются, а имя автора для ETag страницы
+    поста забывается: `post_scopes` запомнит новое при следующем показе.
+    """
+    if not getattr(instance, '_renamed', False):
+        return
+    revise_posts(author=instance)
+    bump_version(POSTS_SCOPE)
+    bump_version(author_scope(instance._old_username))
+    bump_version(author_scope(instance.username))
+    post_ids = set(
+        Post.objects.filter(author=instance).values_list('pk', flat=True)
+    )
+    post_ids.update(
+        Comment.objects
+        .filter(author=instance)
+        .values_list('post_id', flat=True)
+    )
+    cache.delete_many([POST_AUTHOR_KEY.format(pk) for pk in post_ids])
+    for post_id in post_ids:
+        bump_version(post_scope(post_id))
@@ -0,0 +1,14 @@
+from django import template
+
+from ..articles import render_articles
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_articles(posts):
+    """HTML постов страницы, готовый берется из кэша.
+
+    Использование: `{% post_articles page_obj as articles %}`.
+    """
+    return render_articles(posts)
@@ -0,0 +1,14 @@
+from django import template
+
+from ..links import post_url as build_post_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_url(viewname, *args, **kwargs):
+    """Быстрый `{% url %}` для маршрутов `posts`.
+
+    Использование: `{% post_url 'posts:profile' post.author %}`.
+    """
+    return build_post_url(viewname, *args, **kwargs)
@@ -0,0 +1,20 @@
+from django import template
+from django.conf import settings
+
+from ..thumbnails import image_manifest
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/picture.html')
+def post_picture(image):
+    """Адаптивная картинка поста с вариантами по ширине и формату.
+
+    В отличие от `{% thumbnail %}` не создает миниатюры в запросе:
+    пока варианты готовятся, выводится заглушка.
+    """
+    return {
+        'image': image,
+        'picture': image_manifest(image),
+        'sizes': settings.POST_IMAGE_SIZES,
+    }
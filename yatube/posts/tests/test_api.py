@@ -0,0 +1,134 @@
+# posts/tests/test_api.py
+import gzip
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedApiTest(TestCase):
+    """Проверяем JSON API лент и постов."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(settings.POSTS_ON_PAGE + 3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_json(self, url, data=None, **extra):
+        response = self.client.get(url, data, **extra)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response, json.loads(response.content)
+
+    def test_feed_pages_by_cursor(self):
+        """Лента листается курсором и отдает все поля поста."""
+        url = reverse('posts:api_index')
+        response, data = self.get_json(url)
+        self.assertEqual(len(data['results']), settings.POSTS_ON_PAGE)
+        newest = self.posts[-1]
+        self.assertEqual(data['results'][0], {
+            'id': newest.pk,
+            'text': newest.text,
+            'pub_date': newest.pub_date.isoformat(),
+            'author': 'Author',
+            'group': 'group',
+            'image': '',
+        })
+        self.assertIsNone(data['previous_cursor'])
+        response, data = self.get_json(url, {'cursor': data['next_cursor']})
+        self.assertEqual(
+            [record['id'] for record in data['results']],
+            [post.pk for post in reversed(self.posts[:3])],
+        )
+        self.assertIsNone(data['next_cursor'])
+
+    def test_feed_has_no_comments_count(self):
+        """В ленте нет счетчика комментариев: его версия — у поста."""
+        url = reverse('posts:api_index')
+        response, data = self.get_json(url)
+        self.assertNotIn('comments_count', data['results'][0])
+        response, data = self.get_json(url, {'fields': 'comments_count'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_fields_selection(self):
+        """`?fields=` оставляет в ответе только нужные поля."""
+        url = reverse('posts:api_group_list', args=['group'])
+        response, data = self.get_json(url, {'fields': 'id,text'})
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        self.assertIsNotNone(data['next_cursor'])
+        response, data = self.get_json(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_profile_and_missing_objects(self):
+        """Профиль отдает посты автора, неизвестные объекты — 404."""
+        response, data = self.get_json(
+            reverse('posts:api_profile', args=['Author']), {'fields': 'id'}
+        )
+        self.assertEqual(len(data['results']), settings.POSTS_ON_PAGE)
+        for url in (
+            reverse('posts:api_profile', args=['Nobody']),
+            reverse('posts:api_group_list', args=['nothing']),
+            reverse('posts:api_post_detail', args=[0]),
+        ):
+            response, data = self.get_json(url)
+            self.assertEqual(response.status_code, 404)
+
+    def test_post_detail_with_comments(self):
+        """Пост отдается вместе с комментариями."""
+        post = self.posts[0]
+        response, data = self.get_json(
+            reverse('posts:api_post_detail', args=[post.pk]),
+            {'fields': 'id,comments_count'},
+        )
+        self.assertEqual(data['post'], {'id': post.pk, 'comments_count': 1})
+        self.assertEqual(data['comments'][0]['author'], 'Reader')
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий')
+
+    def test_follow_feed_requires_login(self):
+        """Лента подписок доступна только вошедшим."""
+        url = reverse('posts:api_follow_index')
+        response, data = self.get_json(url)
+        self.assertEqual(response.status_code, 401)
+        self.client.force_login(self.reader)
+        response, data = self.get_json(url, {'fields': 'id'})
+        self.assertEqual(data['results'][0]['id'], self.posts[-1].pk)
+        response, data = self.get_json(url, {'cursor': data['next_cursor']})
+        self.assertEqual(len(data['results']), 3)
+
+    def test_gzip_response(self):
+        """Ответ сжимается gzip, ETag становится слабым."""
+        response = self.client.get(
+            reverse('posts:api_index'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['results']), settings.POSTS_ON_PAGE)
+        response = self.client.get(
+            reverse('posts:api_index'),
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
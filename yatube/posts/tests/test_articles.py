@@ -0,0 +1,92 @@
+# posts/tests/test_articles.py
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..articles import article_key, markup_version, render_articles
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class ArticleCacheTest(TestCase):
+    """Проверяем кэш готового HTML постов."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Старый текст'
+        )
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def profile(self):
+        return self.client.get(reverse('posts:profile', args=['Author']))
+
+    def test_article_served_from_cache(self):
+        """Пока ревизия та же, пост берется из кэша."""
+        self.assertContains(self.profile(), 'Старый текст')
+        self.assertIsNotNone(cache.get(article_key(self.post)))
+        # update() не меняет ревизию, поэтому в ленте старый HTML.
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        self.assertContains(self.profile(), 'Старый текст')
+
+    def test_edit_changes_revision(self):
+        """Правка поста меняет ревизию и HTML в ленте."""
+        self.profile()
+        revision = self.post.revision
+        self.client.post(
+            reverse('posts:post_edit', args=[self.post.pk]),
+            {'text': 'Новый текст', 'group': self.group.pk},
+        )
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.revision, revision)
+        self.assertContains(self.profile(), 'Новый текст')
+
+    def test_group_and_author_changes_revise_posts(self):
+        """Правка группы и смена имени автора меняют ревизию постов."""
+        revision = self.post.revision
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.revision, revision)
+        revision = self.post.revision
+        self.author.first_name = 'Лев'
+        self.author.save()
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.revision, revision)
+        revision = self.post.revision
+        self.client.force_login(self.author)
+        self.author.save(update_fields=['last_login'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.revision, revision)
+
+    def test_placeholder_is_not_cached(self):
+        """HTML с заглушкой вместо картинки в кэш не попадает."""
+        post = Post.objects.create(
+            author=self.author, text='С картинкой', image='posts/missing.jpg'
+        )
+        articles = render_articles([post, self.post])
+        self.assertEqual(len(articles), 2)
+        self.assertIn('С картинкой', articles[0])
+        self.assertIsNone(cache.get(article_key(post)))
+        self.assertIsNotNone(cache.get(article_key(self.post)))
+
+    def test_template_change_changes_key(self):
+        """Ключ HTML зависит от исходников шаблонов поста."""
+        key = article_key(self.post)
+        self.addCleanup(markup_version.cache_clear)
+        markup_version.cache_clear()
+        with mock.patch(
+            'posts.articles._template_sources', return_value=['<p></p>']
+        ):
+            self.assertNotEqual(article_key(self.post), key)
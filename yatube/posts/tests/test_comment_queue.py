@@ -0,0 +1,110 @@
+# posts/tests/test_comment_queue.py
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import comment_queue
+from ..models import Comment, Post
+
+User = get_user_model()
+TEMP_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    COMMENT_WRITE_BEHIND=True,
+    COMMENT_QUEUE_PATH=f'{TEMP_DIR}/queue.sqlite3',
+)
+class CommentQueueTest(TestCase):
+    """Проверяем запись комментариев через очередь write-behind."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        comment_queue._queue().execute('DELETE FROM comments')
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.detail = reverse('posts:post_detail', args=[self.post.pk])
+
+    def add_comment(self, text):
+        return self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': text},
+        )
+
+    def test_own_comment_visible_before_flush(self):
+        """Автор видит свой комментарий до переноса, другие — нет."""
+        response = self.add_comment('Из очереди')
+        self.assertRedirects(response, self.detail)
+        self.assertFalse(Comment.objects.exists())
+        self.assertContains(self.client.get(self.detail), 'Из очереди')
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertNotContains(reader.get(self.detail), 'Из очереди')
+
+    def test_flush_saves_batch(self):
+        """Перенос сохраняет пачку, счетчик поста и чистит очередь."""
+        self.add_comment('Первый')
+        self.add_comment('Второй')
+        self.add_comment('')
+        self.assertEqual(comment_queue.drain(), 2)
+        texts = Comment.objects.order_by('pk').values_list('text', flat=True)
+        self.assertEqual(list(texts), ['Первый', 'Второй'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+        self.assertEqual(comment_queue.pending(self.post.pk, self.author), [])
+        self.assertContains(self.client.get(self.detail), 'Второй', count=1)
+
+    def test_claimed_batch_not_flushed_twice(self):
+        """Пачку, взятую другим процессом, перенос не трогает."""
+        self.add_comment('Чужая пачка')
+        self.add_comment('Наша пачка')
+        _, rows = comment_queue._claim(1)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(comment_queue.drain(), 1)
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Наша пачка'],
+        )
+        self.assertEqual(
+            len(comment_queue.pending(self.post.pk, self.author)), 1
+        )
+
+    def test_stale_claim_taken_over(self):
+        """Пачку упавшего процесса забирают по истечении таймаута."""
+        self.add_comment('Брошенная пачка')
+        claim, _ = comment_queue._claim(10)
+        comment_queue._queue().execute(
+            'UPDATE comments SET claimed_at = 0 WHERE claim = ?', (claim,)
+        )
+        self.assertEqual(comment_queue.drain(), 1)
+        self.assertTrue(
+            Comment.objects.filter(text='Брошенная пачка').exists()
+        )
+
+    def test_comments_of_deleted_post_dropped(self):
+        """Комментарии к удаленному посту при переносе отбрасываются."""
+        post = Post.objects.create(author=self.author, text='Удалим')
+        comment_queue.enqueue(post.pk, self.author.pk, 'Потеряется')
+        post.delete()
+        self.assertEqual(comment_queue.drain(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_missing_post(self):
+        """Комментарий к несуществующему посту — 404."""
+        response = self.client.post(
+            reverse('posts:add_comment', args=[0]), {'text': 'Текст'}
+        )
+        self.assertEqual(response.status_code, 404)
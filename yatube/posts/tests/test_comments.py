@@ -0,0 +1,77 @@
+# posts/tests/test_comments.py
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_ON_PAGE=2)
+class CommentPagesTest(TestCase):
+    """Проверяем постраничный вывод и подгрузку комментариев."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {number}'
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста только первые комментарии, от старых."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        page = response.context['comments']
+        self.assertEqual(list(page), self.comments[:2])
+        self.assertContains(response, 'data-more-comments')
+
+    def test_fragments_load_the_rest(self):
+        """Фрагменты по курсору отдают остальные комментарии по порядку."""
+        url = reverse('posts:comments', args=[self.post.pk])
+        loaded = []
+        cursor = ''
+        for _ in range(3):
+            response = self.client.get(url, {'cursor': cursor})
+            page = response.context['comments']
+            loaded += page
+            cursor = page.next_cursor
+        self.assertEqual(loaded, self.comments)
+        self.assertIsNone(cursor)
+        self.assertNotContains(response, 'data-more-comments')
+
+    def test_fragment_of_missing_post(self):
+        """Фрагмент комментариев несуществующего поста — 404."""
+        response = self.client.get(reverse('posts:comments', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_api_comments(self):
+        """JSON API отдает комментарии страницами с курсором."""
+        detail = self.client.get(
+            reverse('posts:api_post_detail', args=[self.post.pk])
+        ).json()
+        self.assertEqual(
+            [comment['id'] for comment in detail['comments']],
+            [comment.pk for comment in self.comments[:2]],
+        )
+        page = self.client.get(
+            reverse('posts:api_comments', args=[self.post.pk]),
+            {'cursor': detail['comments_next_cursor'], 'fields': 'text'},
+        ).json()
+        self.assertEqual(
+            [comment['text'] for comment in page['results']],
+            ['Комментарий 2', 'Комментарий 3'],
+        )
+        self.assertIsNotNone(page['next_cursor'])
+        response = self.client.get(reverse('posts:api_comments', args=[0]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,77 @@
+# posts/tests/test_counters.py
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    """Проверяем денормализованные счетчики."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.author = User.objects.create_user(username='Author')
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счетчики меняются при создании и удалении записей."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.user).following_count, 1)
+        follow.delete()
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.user).following_count, 0)
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+
+    def test_post_edit_keeps_comments_count(self):
+        """Сохранение загруженного поста не затирает новый счетчик."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        stale.text = 'Правка'
+        stale.save()
+        self.client.force_login(self.author)
+        self.client.post(f'/posts/{post.pk}/edit/', {'text': 'Еще правка'})
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Еще правка')
+        self.assertEqual(post.comments_count, 1)
+
+    def test_recount_counters_repairs_drift(self):
+        """Команда recount_counters чинит разошедшиеся счетчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        # bulk_create не шлет сигналов, счетчики расходятся с базой.
+        Post.objects.bulk_create(
+            [Post(author=self.author, text='Пост') for _ in range(3)]
+        )
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.user, text='Текст')]
+        )
+        call_command('recount_counters', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 4)
+        self.assertEqual(post.comments_count, 1)
+
+    def test_profile_uses_counters(self):
+        """Профиль показывает счетчик без подсчета постов."""
+        Post.objects.create(author=self.author, text='Пост')
+        # Автор вместе со счетчиками и страница постов, без COUNT(*).
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/profile/{self.author.username}/')
+            self.assertEqual(response.context['count'], 1)
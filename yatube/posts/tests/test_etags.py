@@ -0,0 +1,217 @@
+# posts/tests/test_etags.py
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+
+from ..caching import cached_page
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    """Проверяем ответы 304 по ETag на страницах постов."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertNotModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified_without_queries(self):
+        """Ответ 304 не делает запросов к базе."""
+        url = reverse('posts:index')
+        etag = self.etag(url)
+        with self.assertNumQueries(0):
+            self.assertNotModified(url, etag)
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertModified(url, etag)
+
+    def test_not_modified_for_user_without_queries(self):
+        """Для вошедшего 304 тоже без базы: сессия не читается."""
+        self.client.force_login(self.reader)
+        url = reverse('posts:index')
+        etag = self.etag(url)
+        with self.assertNumQueries(0):
+            self.assertNotModified(url, etag)
+
+    def test_post_save_reads_nothing_extra(self):
+        """Правка загруженного поста не читает старую группу и автора."""
+        post = Post.objects.select_related('author', 'group').get(
+            pk=self.post.pk
+        )
+        post.text = 'Правка'
+        # UPDATE поста и две записи в поисковый индекс.
+        with self.assertNumQueries(3):
+            post.save()
+
+    def test_post_detail_changes_with_comments(self):
+        """Комментарий меняет ETag страницы поста."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        etag = self.etag(url)
+        self.assertNotModified(url, etag)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertModified(url, etag)
+
+    def test_post_detail_changes_with_author_posts(self):
+        """Новый пост автора меняет счетчик на странице его поста."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        etag = self.etag(url)
+        Post.objects.create(author=self.author, text='Еще пост')
+        self.assertModified(url, etag)
+
+    def test_post_detail_changes_when_author_renamed(self):
+        """Смена имени автора меняет ETag и HTML страницы его поста."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        etag = self.etag(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'Tolstoy'
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+        self.assertModified(url, etag)
+        self.assertContains(self.client.get(url), 'Лев Толстой')
+
+    def test_profile_changes_with_follows(self):
+        """Подписка меняет ETag профилей автора и читателя."""
+        author_url = reverse('posts:profile', args=['Author'])
+        reader_url = reverse('posts:profile', args=['Reader'])
+        author_etag = self.etag(author_url)
+        reader_etag = self.etag(reader_url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertModified(author_url, author_etag)
+        self.assertModified(reader_url, reader_etag)
+
+    def test_group_changes_when_post_moves(self):
+        """Перенос поста меняет страницы обеих групп."""
+        url = reverse('posts:group_list', args=['group'])
+        other_url = reverse('posts:group_list', args=['other'])
+        etag = self.etag(url)
+        other_etag = self.etag(other_url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertModified(url, etag)
+        self.assertModified(other_url, other_etag)
+
+    def test_group_change_refreshes_post_and_profile(self):
+        """Правка группы меняет страницы ее постов, авторов и старый адрес."""
+        post_url = reverse('posts:post_detail', args=[self.post.pk])
+        profile_url = reverse('posts:profile', args=['Author'])
+        group_url = reverse('posts:group_list', args=['group'])
+        self.client.get(post_url)
+        for url in (post_url, profile_url, group_url):
+            self.client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.slug = 'renamed'
+        group.save()
+        self.assertContains(self.client.get(post_url), 'Новое название')
+        self.assertContains(
+            self.client.get(profile_url),
+            reverse('posts:group_list', args=['renamed']),
+        )
+        self.assertEqual(self.client.get(group_url).status_code, 404)
+
+    def test_etag_varies_by_user(self):
+        """Читатели получают разные ETag одной страницы."""
+        url = reverse('posts:index')
+        etag = self.etag(url)
+        self.client.force_login(self.reader)
+        self.assertModified(url, etag)
+        self.assertNotModified(url, self.etag(url))
+
+
+class AnonymousPageCacheTest(TestCase):
+    """Проверяем кэш целых страниц для анонимных читателей."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_anonymous_page_served_from_cache(self):
+        """Повторный запрос аноним получает из кэша без запросов к базе."""
+        url = reverse('posts:profile', args=['Author'])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Пост')
+        self.assertEqual(
+            response['Surrogate-Key'], 'author:Author images'
+        )
+        self.assertIn('s-maxage', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_cached_page_keeps_headers(self):
+        """Ответ из кэша приходит со всеми заголовками свежего."""
+        calls = []
+
+        @cached_page(lambda request: ('test',))
+        def view(request):
+            calls.append(request)
+            response = HttpResponse('Страница')
+            response['Content-Language'] = 'ru'
+            patch_vary_headers(response, ('Accept-Language',))
+            return response
+
+        request = RequestFactory().get('/page/')
+        request.session = {}
+        fresh = view(request)
+        cached = view(request)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cached.content, fresh.content)
+        for header in ('Content-Type', 'Content-Language', 'Vary'):
+            self.assertEqual(cached[header], fresh[header])
+
+    def test_cached_page_purged_on_change(self):
+        """Комментарий сбрасывает закэшированную страницу поста."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        self.client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Свежий комментарий'
+        )
+        self.assertContains(self.client.get(url), 'Свежий комментарий')
+
+    def test_authorized_pages_are_private(self):
+        """Страницы для вошедших не кэшируются и помечены private."""
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('Surrogate-Key'))
@@ -0,0 +1,130 @@
+# posts/tests/test_export.py
+import csv
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..exporter import export_chunks
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    """Проверяем потоковую выгрузку постов и комментариев."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.other = User.objects.create_user(username='Other')
+        cls.staff = User.objects.create_user(username='Staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(5)
+        ]
+        Post.objects.create(author=cls.other, text='Чужой пост')
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.other, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def read(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_export_chunks_by_primary_key(self):
+        """Выгрузка идет пачками, по запросу на пачку."""
+        queryset = Post.objects.filter(author=self.user)
+        with self.assertNumQueries(3):
+            chunks = list(export_chunks('post', queryset, chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(
+            [record['id'] for chunk in chunks for record in chunk],
+            [post.pk for post in self.posts],
+        )
+
+    def test_export_view_streams_own_ndjson(self):
+        """Пользователь выгружает только свои посты в NDJSON."""
+        response = self.client.get(reverse('posts:export', args=['post']))
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Type'], 'application/x-ndjson; charset=utf-8'
+        )
+        records = [
+            json.loads(line)
+            for line in self.read(response).decode().splitlines()
+        ]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0], {
+            'type': 'post',
+            'id': self.posts[0].pk,
+            'author': 'HasNoName',
+            'group': 'group',
+            'text': 'Пост 0',
+            'image': '',
+            'pub_date': self.posts[0].pub_date.isoformat(),
+        })
+
+    def test_export_view_gzip_csv(self):
+        """CSV сжимается gzip на лету, если клиент его принимает."""
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('posts:export', args=['comment']),
+            {'format': 'csv', 'all': '1'},
+            HTTP_ACCEPT_ENCODING='gzip, deflate',
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = list(csv.DictReader(
+            StringIO(gzip.decompress(self.read(response)).decode())
+        ))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['author'], 'Other')
+        self.assertEqual(rows[0]['post'], str(self.posts[0].pk))
+
+    def test_export_view_respects_refused_gzip(self):
+        """`gzip;q=0` — отказ от gzip, ответ уходит без сжатия."""
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('posts:export', args=['comment']),
+            {'format': 'csv', 'all': '1'},
+            HTTP_ACCEPT_ENCODING='gzip;q=0, identity',
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn(b'Other', self.read(response))
+
+    def test_export_all_requires_staff(self):
+        """Все записи выгружает только персонал, чужой тип — 404."""
+        response = self.client.get(
+            reverse('posts:export', args=['post']), {'all': '1'}
+        )
+        self.assertEqual(self.read(response).count(b'\n'), 5)
+        response = self.client.get(reverse('posts:export', args=['user']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_command_round_trips_through_import(self):
+        """Выгрузку команды можно загрузить обратно через import_posts."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'posts.ndjson.gz')
+            call_command(
+                'export_posts', 'post', '--output', path, '--chunk-size', '2',
+                stderr=StringIO(),
+            )
+            Post.objects.all().delete()
+            call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 6)
+        post = Post.objects.get(pk=self.posts[0].pk)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date, self.posts[0].pub_date)
@@ -1,13 +1,20 @@
 # posts/tests/tests_forms.py
 import shutil
+import struct
+import subprocess
+import sys
 import tempfile
+import zlib
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from posts.forms import PostForm
 from posts.models import Comment, Group, Post
 
 User = get_user_model()
@@ -133,3 +140,128 @@ class PostsCreateFormTests(TestCase):
         self.assertEqual(latest.pk, comments_count + 1)
         self.assertEqual(latest.text, form_data['text'])
         self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+# Уменьшение картинки в отдельном процессе: печатает, на сколько
+# килобайт вырос пик памяти процесса. Пиксели Pillow выделяет мимо
+# аллокатора Python, `tracemalloc` их не видит, а пик RSS видит.
+MEASURE_DOWNSAMPLE = """
+import resource, sys
+from io import BytesIO
+from django.conf import settings
+settings.configure(POST_IMAGE_MAX_SIDE=240, POST_IMAGE_QUALITY=90)
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from posts.uploads import downsample_image
+content = sys.stdin.buffer.read()
+upload = SimpleUploadedFile('big.jpg', content, 'image/jpeg')
+upload.image = Image.open(BytesIO(content))
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+downsample_image(upload)
+grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+print(grown // 1024 if sys.platform == 'darwin' else grown)
+"""
+
+
+def png_header(width, height):
+    """PNG с заголовком нужного размера, но без пикселей."""
+    def chunk(kind, data):
+        body = kind + data
+        return (
+            struct.pack('>I', len(data)) + body
+            + struct.pack('>I', zlib.crc32(body))
+        )
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>II5B', width, height, 8, 0, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(b'\x00'))
+        + chunk(b'IEND', b'')
+    )
+
+
+class PostImageUploadTests(TestCase):
+    """Проверка ограничений на загружаемые картинки."""
+
+    def make_form(self, content, name='image.png', content_type='image/png'):
+        return PostForm(
+            data={'text': 'Текст поста'},
+            files={
+                'image': SimpleUploadedFile(
+                    name=name, content=content, content_type=content_type
+                )
+            },
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIZE=10)
+    def test_large_file_rejected(self):
+        """Файл больше лимита не принимается."""
+        form = self.make_form(png_header(10, 10))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
+
+    def test_too_many_pixels_rejected_by_header(self):
+        """Картинка больше лимита пикселей отсекается по заголовку."""
+        form = self.make_form(png_header(10000, 10000))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    def test_decompression_bomb_rejected(self):
+        """Бомба декомпрессии не доходит до декодирования пикселей."""
+        form = self.make_form(png_header(30000, 30000))
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=240)
+    def test_large_jpeg_downsampled(self):
+        """Большой JPEG уменьшается до POST_IMAGE_MAX_SIDE."""
+        content = BytesIO()
+        Image.new('RGB', (2000, 1500), color=(0, 100, 0)).save(
+            content, 'JPEG'
+        )
+        form = self.make_form(
+            content.getvalue(), name='big.jpg', content_type='image/jpeg'
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as result:
+            self.assertEqual(result.size, (240, 180))
+
+    def test_jpeg_downsampled_without_full_decode(self):
+        """Пик памяти при уменьшении много меньше полного буфера пикселей."""
+        content = BytesIO()
+        Image.new('RGB', (6000, 4000), color=(0, 100, 0)).save(
+            content, 'JPEG'
+        )
+        measured = subprocess.run(
+            [sys.executable, '-c', MEASURE_DOWNSAMPLE],
+            input=content.getvalue(),
+            stdout=subprocess.PIPE,
+            cwd=settings.BASE_DIR,
+            check=True,
+        )
+        full_kilobytes = 6000 * 4000 * 3 // 1024
+        self.assertLess(int(measured.stdout), full_kilobytes // 8)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=240)
+    def test_exif_orientation_applied(self):
+        """Поворот из EXIF переносится в пиксели уменьшенной картинки."""
+        content = BytesIO()
+        exif = Image.Exif()
+        # 0x0112 — Orientation, 6 — повернуть на 90° по часовой.
+        exif[0x0112] = 6
+        Image.new('RGB', (400, 300)).save(content, 'JPEG', exif=exif)
+        form = self.make_form(
+            content.getvalue(), name='photo.jpg', content_type='image/jpeg'
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as result:
+            self.assertEqual(result.size, (180, 240))
+
+    @override_settings(POST_IMAGE_MAX_DECODE_PIXELS=10 ** 6)
+    def test_full_decode_formats_have_lower_limit(self):
+        """PNG декодируется целиком, для него лимит пикселей строже."""
+        form = self.make_form(png_header(2000, 1000))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
@@ -0,0 +1,133 @@
+# posts/tests/test_import.py
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Group, Post, Timeline, UserCounters
+from ..search import get_backend
+
+User = get_user_model()
+
+
+class ImportPostsTest(TestCase):
+    """Проверяем загрузку записей командой import_posts."""
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as file_:
+            file_.write(content)
+        return path
+
+    def ndjson(self, name, records):
+        return self.write(name, ''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records
+        ))
+
+    def import_posts(self, *args, out=None):
+        out = out or StringIO()
+        call_command('import_posts', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_import_ndjson_rebuilds_derived_data(self):
+        """Загрузка пересчитывает счетчики, индекс поиска и ленты."""
+        path = self.ndjson('dump.ndjson.gz', [
+            {'type': 'group', 'slug': 'cats', 'title': 'Кошки'},
+            {
+                'type': 'post', 'id': 500, 'author': 'writer',
+                'group': 'cats', 'text': 'Рыжая кошка спит',
+                'pub_date': '2020-01-02T10:00:00',
+            },
+            {'type': 'comment', 'post': 500, 'author': 'reader',
+             'text': 'Мур'},
+            {'type': 'comment', 'post': 999, 'author': 'reader',
+             'text': 'Нет поста'},
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+            {'type': 'follow', 'user': 'reader', 'author': 'reader'},
+        ])
+        self.import_posts(path, '--create-users', '--batch-size', '2')
+        writer = User.objects.get(username='writer')
+        self.assertFalse(writer.has_usable_password())
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.group, Group.objects.get(slug='cats'))
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        counters = UserCounters.objects.get(user=writer)
+        self.assertEqual(counters.posts_count, 1)
+        self.assertEqual(counters.followers_count, 1)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(get_backend().search_ids('кошки', 10), [500])
+
+    def test_import_csv_skips_unknown_authors(self):
+        """Без --create-users строки неизвестных авторов пропускаются."""
+        path = self.write(
+            'posts.csv',
+            'author,text\nreader,Первый пост\nstranger,Чужой пост\n',
+        )
+        output = self.import_posts(path, '--type', 'post')
+        self.assertIn('post     загружено 1, пропущено 1', output)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)),
+            ['Первый пост'],
+        )
+        self.assertFalse(User.objects.filter(username='stranger').exists())
+
+    @override_settings(TIMELINE_BACKFILL=2)
+    def test_import_rebuilds_only_touched_rows(self):
+        """Счетчики пересчитываются только у задетых, ленты — с лимитом."""
+        writer = User.objects.create_user(username='writer')
+        Follow.objects.create(user=self.reader, author=writer)
+        bystander = User.objects.create_user(username='bystander')
+        UserCounters.objects.filter(user=bystander).delete()
+        UserCounters.objects.create(user=bystander, posts_count=7)
+        path = self.ndjson('posts.ndjson', [
+            {
+                'type': 'post', 'author': 'writer', 'text': f'Пост {day}',
+                'pub_date': f'2020-01-0{day}T10:00:00',
+            }
+            for day in range(1, 4)
+        ])
+        self.import_posts(path)
+        self.assertEqual(
+            UserCounters.objects.get(user=writer).posts_count, 3
+        )
+        self.assertEqual(
+            UserCounters.objects.get(user=bystander).posts_count, 7
+        )
+        self.assertEqual(
+            list(
+                Timeline.objects.filter(user=self.reader)
+                .order_by('-pub_date').values_list('post__text', flat=True)
+            ),
+            ['Пост 3', 'Пост 2'],
+        )
+
+    def test_duplicate_post_id_reported_with_summary(self):
+        """Отвергнутая базой пачка — ошибка команды, но с итогом."""
+        path = self.ndjson('dump.ndjson', [
+            {'type': 'group', 'slug': 'cats', 'title': 'Кошки'},
+            {'type': 'group', 'slug': 'cats', 'title': 'Кошки снова'},
+            {'type': 'post', 'id': 700, 'author': 'reader', 'text': 'Раз'},
+            {'type': 'post', 'id': 700, 'author': 'reader', 'text': 'Два'},
+        ])
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "post: пачка из 2"):
+            self.import_posts(path, '--batch-size', '2', out=out)
+        self.assertIn('group    загружено 1, пропущено 1', out.getvalue())
+        self.assertIn('post     загружено 0, пропущено 0', out.getvalue())
+        self.assertFalse(Post.objects.filter(pk=700).exists())
@@ -0,0 +1,77 @@
+# posts/tests/test_indexes.py
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post
+from ..timeline import follow_feed
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedIndexesTest(TestCase):
+    """Проверяем, что запросы лент идут по индексам."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group',
+            description='Тестовое описание',
+        )
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoTableScan(self, plan):
+        for step in plan:
+            self.assertFalse(
+                step.startswith('SCAN') and 'USING' not in step,
+                f'Полный проход по таблице: {plan}'
+            )
+
+    def test_feeds_use_index_without_sorting(self):
+        """Ленты читаются по индексу и не сортируются во временном дереве."""
+        posts = Post.objects.select_related('author', 'group')
+        feeds = {
+            'index': posts.all(),
+            'group_posts': posts.filter(group=self.group),
+            'profile': posts.filter(author=self.user),
+            'post_detail': (
+                Comment.objects.filter(post=1).order_by('pub_date')
+            ),
+        }
+        for name, queryset in feeds.items():
+            with self.subTest(view=name):
+                plan = self.explain(queryset[:10])
+                self.assertNoTableScan(plan)
+                self.assertFalse(
+                    any('TEMP B-TREE' in step for step in plan),
+                    f'Сортировка без индекса: {plan}'
+                )
+
+    def test_follow_queries_use_index(self):
+        """Запросы подписок идут по индексам ленты и Follow."""
+        queries = (
+            follow_feed(self.user)[:10],
+            Follow.objects.filter(user=self.user, author=self.user),
+        )
+        for queryset in queries:
+            with self.subTest(query=str(queryset.query)):
+                self.assertNoTableScan(self.explain(queryset))
+
+    def test_follow_feed_reads_timeline_index(self):
+        """Лента подписок читается диапазоном по индексу ленты."""
+        plan = self.explain(follow_feed(self.user)[:10])
+        self.assertIn('timeline_user_pub_date_idx', plan[0])
+        self.assertFalse(
+            any('TEMP B-TREE FOR ORDER BY' in step for step in plan),
+            f'Сортировка без индекса: {plan}'
+        )
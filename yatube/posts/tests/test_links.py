@@ -0,0 +1,71 @@
+# posts/tests/test_links.py
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.test import SimpleTestCase
+from django.urls import NoReverseMatch, reverse, set_script_prefix
+
+from ..links import _build, post_url, routes
+
+User = get_user_model()
+
+
+class PostUrlTest(SimpleTestCase):
+    """Проверяем быстрое построение адресов `posts`."""
+    def test_same_as_reverse(self):
+        """Адреса совпадают с `reverse()` для всех маршрутов."""
+        values = {
+            'slug': 'group_1', 'username': 'Лев Толстой', 'post_id': 7,
+            'record_type': 'posts',
+        }
+        self.assertIn('post_detail', routes())
+        for name, (_, parameters) in routes().items():
+            args = [values[parameter] for parameter, _ in parameters]
+            with self.subTest(name=name):
+                self.assertEqual(
+                    post_url(f'posts:{name}', *args),
+                    reverse(f'posts:{name}', args=args),
+                )
+        self.assertEqual(
+            post_url('posts:post_detail', post_id=7),
+            reverse('posts:post_detail', kwargs={'post_id': 7}),
+        )
+        self.assertEqual(
+            post_url('posts:profile', User(username='leo')),
+            '/profile/leo/',
+        )
+
+    def test_fallback_and_errors(self):
+        """Прочие маршруты и ошибки отдаются `reverse()`."""
+        self.assertEqual(post_url('about:author'), reverse('about:author'))
+        bad_calls = (
+            ('posts:post_detail', ('abc',), {}),
+            ('posts:group_list', ('не slug',), {}),
+            ('posts:profile', (), {}),
+            ('posts:index', (), {'page': 2}),
+            ('posts:missing', (), {}),
+        )
+        for viewname, args, kwargs in bad_calls:
+            with self.subTest(viewname=viewname, args=args):
+                with self.assertRaises(NoReverseMatch):
+                    post_url(viewname, *args, **kwargs)
+
+    def test_script_prefix_and_memo(self):
+        """Префикс скрипта учитывается, память адресов ограничена."""
+        set_script_prefix('/site/')
+        try:
+            self.assertEqual(
+                post_url('posts:post_detail', 1), '/site/posts/1/'
+            )
+        finally:
+            set_script_prefix('/')
+        self.assertEqual(post_url('posts:post_detail', 1), '/posts/1/')
+        self.assertIsNotNone(_build.cache_info().maxsize)
+
+    def test_template_tag(self):
+        """Тег `{% post_url %}` выводит тот же адрес, что `{% url %}`."""
+        template = Template(
+            "{% load post_links %}{% post_url 'posts:group_list' slug %}"
+            "|{% url 'posts:group_list' slug %}"
+        )
+        fast, slow = template.render(Context({'slug': 'cats'})).split('|')
+        self.assertEqual(fast, slow)
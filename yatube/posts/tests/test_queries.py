@@ -0,0 +1,21 @@
+# posts/tests/test_queries.py
+from django.test import TestCase
+
+from ..benchmarks import BUDGETS, over_budget, run_cases, seed, view_cases
+
+
+class QueryBudgetTest(TestCase):
+    """Страницы постов укладываются в бюджет запросов к базе."""
+    @classmethod
+    def setUpTestData(cls):
+        seed(users=30, posts=300, groups=3, follows=3)
+
+    def test_views_within_query_budget(self):
+        """Ни одна страница не делает запросов сверх бюджета (N+1)."""
+        results = run_cases(self.client, view_cases(), repeat=1)
+        budgets = {
+            name: {'queries': budget['queries']}
+            for name, budget in BUDGETS.items()
+        }
+        self.assertEqual(set(results), set(BUDGETS))
+        self.assertEqual(over_budget(results, budgets), [])
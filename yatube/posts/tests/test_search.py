@@ -0,0 +1,86 @@
+# posts/tests/test_search.py
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import get_backend, stem
+
+User = get_user_model()
+
+
+class StemTest(TestCase):
+    """Проверяем стеммер русских слов."""
+    def test_stem_word_forms(self):
+        """Разные формы слова сводятся к одной основе."""
+        forms = ('кошка', 'кошки', 'кошкой', 'кошек')
+        self.assertEqual({stem(word) for word in forms}, {'кошк', 'кошек'})
+        self.assertEqual(stem('Бегали'), stem('бегала'))
+        self.assertEqual(stem('ёлками'), stem('елки'))
+
+    def test_stem_keeps_latin(self):
+        """Латиница и числа остаются как есть."""
+        self.assertEqual(stem('Django'), 'django')
+        self.assertEqual(stem('2022'), '2022')
+
+
+class SearchTest(TestCase):
+    """Проверяем полнотекстовый поиск по постам."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            author=self.user, text='Кошки гуляли по крышам'
+        )
+        self.other = Post.objects.create(
+            author=self.user, text='Собака спала у двери'
+        )
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_finds_word_forms(self):
+        """Поиск находит пост по другой форме слова."""
+        self.assertEqual(self.found('кошка'), [self.post])
+        self.assertEqual(self.found('крыша кошкам'), [self.post])
+        self.assertEqual(self.found('собаки'), [self.other])
+
+    def test_search_matches_whole_stems(self):
+        """Основа запроса не находит слова, которые с нее начинаются."""
+        Post.objects.create(author=self.user, text='Котлеты остыли')
+        self.assertEqual(self.found('кот'), [])
+        self.assertEqual(len(self.found('котлета')), 1)
+
+    def test_search_follows_edits_and_deletes(self):
+        """Индекс следует за правкой и удалением поста."""
+        self.post.text = 'Птицы пели'
+        self.post.save()
+        self.assertEqual(self.found('кошка'), [])
+        self.assertEqual(self.found('птица'), [self.post])
+        self.post.delete()
+        self.assertEqual(self.found('птица'), [])
+
+    def test_search_ranks_and_paginates(self):
+        """Результаты ранжированы и разбиты на страницы."""
+        Post.objects.create(author=self.user, text='Кошки, кошки и кошки')
+        ranked = get_backend().search('кошка')
+        self.assertEqual(ranked[0].text, 'Кошки, кошки и кошки')
+        for _ in range(settings.POSTS_ON_PAGE):
+            Post.objects.create(author=self.user, text='Кошка')
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'кошка', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B0&')
+
+    def test_search_ignores_query_syntax(self):
+        """Спецсимволы FTS в запросе не ломают поиск."""
+        self.assertEqual(self.found('"кошка* - ('), [self.post])
+        self.assertIsNone(
+            self.client.get(reverse('posts:search')).context['page_obj']
+        )
@@ -0,0 +1,99 @@
+# posts/tests/test_thumbnails.py
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+from ..thumbnails import (generate_variants, image_manifest, manifest_path,
+                          supported_formats)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailsTest(TestCase):
+    """Проверяем создание вариантов картинок вне запроса."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        image = BytesIO()
+        Image.new('RGB', (1000, 400), color=(200, 0, 0)).save(image, 'JPEG')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='photo.jpg',
+                content=image.getvalue(),
+                content_type='image/jpeg'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default_storage.delete(manifest_path(self.post.image.name))
+
+    def test_page_shows_placeholder_while_pending(self):
+        """Пока вариантов нет, страница не ждет их, а рисует заглушку."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertTemplateUsed(
+            response, 'includes/thumbnail_placeholder.html'
+        )
+        self.assertIsNone(image_manifest(self.post.image))
+
+    def test_page_shows_responsive_variants(self):
+        """После фоновой генерации страница отдает srcset вариантов."""
+        generate_variants(self.post.image.name)
+        picture = image_manifest(self.post.image)
+        self.assertIsNotNone(picture)
+        self.assertIn('320w', picture['srcset'])
+        self.assertIn('960w', picture['srcset'])
+        # Картинку шириной 1000 не растягиваем до 1920.
+        self.assertNotIn('1920w', picture['srcset'])
+        self.assertEqual(
+            [source['type'] for source in picture['sources']],
+            [
+                f'image/{format_.lower()}'
+                for format_ in supported_formats() if format_ != 'JPEG'
+            ]
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertContains(response, picture['src'])
+        self.assertContains(response, 'sizes=')
+
+    def test_manifest_survives_cache_loss(self):
+        """Набор вариантов читается из хранилища, если кэш потерян."""
+        generate_variants(self.post.image.name)
+        picture = image_manifest(self.post.image)
+        cache.clear()
+        self.assertEqual(image_manifest(self.post.image), picture)
+
+    def test_feed_fragment_refreshed_when_variants_ready(self):
+        """Закэшированный фрагмент ленты не держит заглушку картинки."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertTemplateUsed(
+            response, 'includes/thumbnail_placeholder.html'
+        )
+        generate_variants(self.post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, image_manifest(self.post.image)['src'])
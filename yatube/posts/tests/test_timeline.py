@@ -0,0 +1,107 @@
+# posts/tests/test_timeline.py
+from datetime import timedelta
+
+from core.models import explicit_pub_dates
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, Timeline
+from ..timeline import CAUGHT_UP_KEY, follow_feed
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    """Проверяем материализованную ленту подписок."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.author = User.objects.create_user(username='Author')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def follow(self):
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author})
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка переносит старые посты в ленту, отписка убирает."""
+        self.follow()
+        self.assertTrue(
+            Timeline.objects.filter(user=self.user, post=self.old_post)
+            .exists()
+        )
+        self.authorized_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.author}
+            )
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора сразу появляется в ленте подписчика."""
+        self.follow()
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+        self.assertEqual(
+            Timeline.objects.get(user=self.user, post=post).pub_date,
+            post.pub_date
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_posts_are_pulled(self):
+        """Посты популярного автора не раскладываются, а догружаются."""
+        Follow.objects.create(user=self.user, author=self.author)
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        self.assertEqual(
+            list(follow_feed(self.user)),
+            [post, self.old_post]
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_catch_up_is_throttled(self):
+        """Догрузка идет не чаще интервала и не трогает старые записи."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(list(follow_feed(self.user)), [self.old_post])
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(list(follow_feed(self.user)), [self.old_post])
+        cache.delete(CAUGHT_UP_KEY.format(self.user.pk))
+        self.assertEqual(
+            list(follow_feed(self.user)),
+            [post, self.old_post]
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1, TIMELINE_BATCH_SIZE=2)
+    def test_popular_author_catch_up_loads_everything_new(self):
+        """Догружаются все новые посты, и с датой старше прочитанных."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(list(follow_feed(self.user)), [self.old_post])
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(5)
+        ]
+        with explicit_pub_dates(Post):
+            backdated = Post.objects.create(
+                author=self.author,
+                text='Пост задним числом',
+                pub_date=self.old_post.pub_date - timedelta(days=1),
+            )
+        cache.delete(CAUGHT_UP_KEY.format(self.user.pk))
+        with override_settings(TIMELINE_BACKFILL=1):
+            feed = list(follow_feed(self.user))
+        self.assertEqual(set(feed), {*posts, self.old_post, backdated})
@@ -6,7 +6,10 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Page
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..forms import PostForm
@@ -200,7 +203,7 @@ class PaginatorViewsTest(TestCase):
 
 
 class CachingTest(TestCase):
-    """Проверка работы кэша на странице index."""
+    """Проверка работы кэша на страницах лент."""
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -211,6 +214,7 @@ class CachingTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         # Создаем клиент
         self.authorized_client = Client()
         # Авторизуем пользователя
@@ -219,13 +223,38 @@ class CachingTest(TestCase):
     def test_index_page_caching(self):
         """Проверяем работу кэша списка записей на главной странице."""
         response_1 = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.filter(pk=self.post.id).delete()
+        # update() не шлет сигналов, поэтому фрагмент остается в кэше.
+        Post.objects.filter(pk=self.post.id).update(text='Новый текст.')
         response_2 = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response_1.content, response_2.content)
         cache.clear()
         response_3 = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response_1.content, response_3.content)
 
+    def test_index_cache_invalidated_on_post_change(self):
+        """Удаление поста сбрасывает кэш главной страницы."""
+        response_1 = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response_1, self.post.text)
+        Post.objects.filter(pk=self.post.id).delete()
+        response_2 = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response_2, self.post.text)
+
+    def test_index_cache_depends_on_page(self):
+        """Вторая страница не отдается из кэша первой."""
+        Post.objects.bulk_create(
+            [
+                Post(text=f'{i} - Тестовый пост.', author=self.user)
+                for i in range(settings.POSTS_ON_PAGE)
+            ]
+        )
+        cache.clear()
+        response_1 = self.authorized_client.get(reverse('posts:index'))
+        response_2 = self.authorized_client.get(
+            reverse('posts:index') + '?page=2'
+        )
+        self.assertNotEqual(response_1.content, response_2.content)
+        self.assertContains(response_2, self.post.text)
+
 
 class FollowingTest(TestCase):
     """Проверка работы подписок, отписок на страницах авторов."""
@@ -299,3 +328,117 @@ class FollowingTest(TestCase):
         self.assertEqual(post_text, self.post_author.text)
         response = self.authorized_client_two.get('/follow/')
         self.assertNotContains(response, self.post_author.text)
+
+
+class CursorPaginatorViewsTest(TestCase):
+    """Проверяем курсорный paginator на страницах."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Cursor')
+        cls.group = Group.objects.create(
+            title='Группа cursor',
+            slug='cursor_group',
+            description='Описание для группы cursor',
+        )
+        Post.objects.bulk_create(
+            [
+                Post(
+                    text=f'{i} - Тестовый пост с группой.',
+                    author=cls.user,
+                    group=cls.group,
+                )
+                for i in range(CREATE_POST)
+            ]
+        )
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Листание по курсору вперед и назад не теряет записей."""
+        check_pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}),
+        )
+        expected = list(
+            Post.objects.filter(author=self.user).order_by('-pub_date', '-pk')
+        )
+        for page in check_pages:
+            with self.subTest(page=page):
+                first = self.client.get(page + '?cursor=').context['page_obj']
+                self.assertFalse(first.has_previous())
+                self.assertEqual(
+                    list(first), expected[:settings.POSTS_ON_PAGE]
+                )
+                second = self.client.get(
+                    page + f'?cursor={first.next_cursor}'
+                ).context['page_obj']
+                self.assertFalse(second.has_next())
+                self.assertEqual(
+                    list(second), expected[settings.POSTS_ON_PAGE:]
+                )
+                back = self.client.get(
+                    page + f'?cursor={second.previous_cursor}'
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_first_page_without_count(self):
+        """Первая страница читается по ключу, без COUNT(*) и OFFSET."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        sql = ' '.join(query['sql'] for query in queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+        self.assertTrue(response.context['page_obj'].has_next())
+
+    def test_fragment_hit_reads_no_posts(self):
+        """Лента из кэша фрагментов не читает записи из базы."""
+        cache.clear()
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse('posts:index'))
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('"posts_post"', sql)
+
+    def test_numbered_page_breaks_ties_by_id(self):
+        """`?page=N` идет в том же порядке `(pub_date, id)`, что и курсор."""
+        cache.clear()
+        response = self.client.get(reverse('posts:index') + '?page=2')
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(
+                Post.objects.order_by('-pub_date', '-pk')[
+                    settings.POSTS_ON_PAGE:settings.POSTS_ON_PAGE * 2
+                ]
+            ),
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор отдает первую страницу, а не ошибку."""
+        response = self.client.get(reverse('posts:index') + '?cursor=xx!')
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.has_next())
+        self.assertEqual(len(page_obj), settings.POSTS_ON_PAGE)
+
+    def test_numbered_page_links_to_cursors(self):
+        """Страница по номеру ведет дальше по курсору, а не по OFFSET."""
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj, Page)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+        self.assertNotContains(response, '?page=')
+        second = self.client.get(
+            reverse('posts:index') + f'?cursor={page_obj.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(
+            list(second),
+            list(
+                Post.objects.order_by('-pub_date', '-pk')[
+                    settings.POSTS_ON_PAGE:settings.POSTS_ON_PAGE * 2
+                ]
+            ),
+        )
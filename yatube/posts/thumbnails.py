@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+
+from core.background import submit
+
+from .caching import IMAGES_SCOPE, bump_version
+
+logger = logging.getLogger(__name__)
+
+# Набор готовых вариантов картинки хранится файлом рядом с миниатюрами,
+# а кэш под ключом MANIFEST_KEY только ускоряет его чтение.
+MANIFEST_PATH: str = 'manifests/{}.json'
+MANIFEST_KEY: str = 'post_image:{}'
+# Расширения файлов и MIME-типы форматов вариантов.
+FORMAT_EXTENSIONS = {
+    'AVIF': 'avif',
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+}
+FORMAT_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+}
+
+# Картинки, для которых варианты уже стоят в очереди.
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+class VariantThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который знает расширение AVIF."""
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        key = tokey(source.key, geometry_string, serialize(options))
+        path = '%s/%s/%s' % (key[:2], key[2:4], key)
+        return '%s%s.%s' % (
+            sorl_settings.THUMBNAIL_PREFIX,
+            path,
+            FORMAT_EXTENSIONS[options['format']],
+        )
+
+
+backend = VariantThumbnailBackend()
+
+
+def supported_formats():
+    """Форматы из настроек, которые умеет сохранять установленный Pillow."""
+    Image.init()
+    return [
+        format_ for format_ in settings.POST_IMAGE_FORMATS
+        if format_ in Image.SAVE
+    ]
+
+
+def variant_geometry(width):
+    """Геометрия варианта ширины `width` с пропорциями ленты."""
+    return f'{width}x{round(width / settings.POST_IMAGE_RATIO)}'
+
+
+def image_variants(source_width=None):
+    """Пары `(формат, ширина)`, которые нужно создать для картинки.
+
+    Ширины больше исходной пропускаются, кроме запасной: ее вариант
+    нужен всегда, для `src` без `srcset`.
+    """
+    fallback_format, fallback_width = settings.POST_IMAGE_FALLBACK
+    for format_ in supported_formats():
+        for width in settings.POST_IMAGE_WIDTHS:
+            is_fallback = (format_, width) == (fallback_format, fallback_width)
+            if source_width and width > source_width and not is_fallback:
+                continue
+            yield format_, width
+
+
+def _digest(name):
+    return hashlib.md5(name.encode()).hexdigest()
+
+
+def manifest_key(name):
+    return MANIFEST_KEY.format(_digest(name))
+
+
+def manifest_path(name):
+    return sorl_settings.THUMBNAIL_PREFIX + MANIFEST_PATH.format(_digest(name))
+
+
+def _save_manifest(name, manifest):
+    path = manifest_path(name)
+    if default.storage.exists(path):
+        default.storage.delete(path)
+    default.storage.save(path, ContentFile(json.dumps(manifest).encode()))
+    cache.set(manifest_key(name), manifest, None)
+
+
+def load_manifest(name):
+    """Набор вариантов из кэша, при промахе — из хранилища, или None."""
+    manifest = cache.get(manifest_key(name))
+    if manifest is None:
+        try:
+            with default.storage.open(manifest_path(name)) as file_:
+                manifest = json.load(file_)
+        except (OSError, ValueError):
+            return None
+        cache.set(manifest_key(name), manifest, None)
+    return manifest
+
+
+def _source_width(name):
+    # Pillow читает только заголовок файла, без декодирования пикселей.
+    try:
+        with default.storage.open(name) as file_:
+            return Image.open(file_).size[0]
+    except (OSError, ValueError):
+        return None
+
+
+def generate_variants(name):
+    """Создает все варианты картинки и сохраняет их набор."""
+    try:
+        srcsets = {}
+        for format_, width in image_variants(_source_width(name)):
+            thumbnail = backend.get_thumbnail(
+                name,
+                variant_geometry(width),
+                crop='center',
+                upscale=True,
+                format=format_,
+            )
+            srcsets.setdefault(format_, []).append((width, thumbnail.url))
+        fallback_format, fallback_width = settings.POST_IMAGE_FALLBACK
+        fallback = dict(srcsets.pop(fallback_format))
+        manifest = {
+            'src': fallback[fallback_width],
+            'srcset': _srcset(fallback.items()),
+            'sources': [
+                {'type': FORMAT_TYPES[format_], 'srcset': _srcset(variants)}
+                for format_, variants in srcsets.items()
+            ],
+        }
+        _save_manifest(name, manifest)
+        # Страницы с заглушкой вместо картинки больше не актуальны.
+        bump_version(IMAGES_SCOPE)
+    except Exception:
+        logger.exception('Не удалось создать варианты картинки %s', name)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def _srcset(variants):
+    return ', '.join(f'{url} {width}w' for width, url in variants)
+
+
+def _submit(name):
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if settings.THUMBNAIL_ASYNC:
+        submit(generate_variants, name, pool='thumbnails',
+               workers=settings.THUMBNAIL_WORKERS)
+    else:
+        generate_variants(name)
+
+
+def schedule_thumbnails(image):
+    """Ставит создание вариантов в очередь после коммита транзакции.
+
+    Без `THUMBNAIL_ASYNC` варианты создаются сразу, в текущем потоке.
+    """
+    if image:
+        name = image.name
+        transaction.on_commit(lambda: _submit(name))
+
+
+def image_manifest(image):
+    """Набор готовых вариантов картинки или None, пока их нет.
+
+    Если набора нет, создание вариантов ставится в очередь.
+    """
+    if not image:
+        return None
+    manifest = load_manifest(image.name)
+    if manifest is None:
+        schedule_thumbnails(image)
+    return manifest
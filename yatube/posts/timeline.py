@@ -0,0 +1,202 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Max
+
+from core.background import submit
+
+from .caching import bump_version, follow_scope
+from .models import Follow, Post, Timeline, UserCounters
+
+# Ключ кэша со списком авторов, чьи посты читаются напрямую.
+PULL_AUTHORS_KEY: str = 'timeline:pull_authors'
+# Ключ кэша, пока он жив, лента читателя считается догнанной.
+CAUGHT_UP_KEY: str = 'timeline:caught_up:{}'
+
+
+def pull_author_ids():
+    """Авторы с очень большим числом подписчиков.
+
+    Их посты не раскладываются по лентам при публикации, а
+    догружаются в ленту подписчика при чтении, см. `catch_up()`.
+    """
+    author_ids = cache.get(PULL_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = frozenset(
+            UserCounters.objects
+            .filter(followers_count__gte=settings.TIMELINE_FANOUT_LIMIT)
+            .values_list('user_id', flat=True)
+        )
+        cache.set(
+            PULL_AUTHORS_KEY, author_ids, settings.TIMELINE_PULL_AUTHORS_TTL
+        )
+    return author_ids
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in pull_author_ids():
+        return
+    follower_ids = (
+        Follow.objects
+        .filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator()
+    )
+    entries = (
+        Timeline(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in follower_ids
+    )
+    _bulk_insert(entries)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    posts = (
+        Post.objects
+        .filter(author_id=author_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    )
+    entries = (
+        Timeline(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts
+    )
+    _bulk_insert(entries)
+
+
+def backfill_follows(follows):
+    """Добавляет в ленты последние посты авторов для выборки подписок.
+
+    То же, что `backfill()` для каждой подписки, но одним запросом
+    INSERT ... SELECT: посты автора нумеруются оконной функцией, в
+    ленты попадают первые `TIMELINE_BACKFILL`.
+    """
+    follows_sql, params = (
+        follows.order_by().values('user_id', 'author_id')
+        .query.sql_with_params()
+    )
+    ops = connection.ops
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=True)} '
+        f'{Timeline._meta.db_table} (user_id, post_id, author_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+        f'FROM ({follows_sql}) f JOIN ('
+        f'SELECT id, author_id, pub_date, row_number() OVER ('
+        f'PARTITION BY author_id ORDER BY pub_date DESC) AS position '
+        f'FROM {Post._meta.db_table} '
+        f'WHERE author_id IN (SELECT author_id FROM ({follows_sql}) a)'
+        f') p ON p.author_id = f.author_id AND p.position <= %s '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, (*params, *params, settings.TIMELINE_BACKFILL)
+        )
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты после отписки."""
+    Timeline.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _bulk_insert(entries):
+    """Вставляет записи ленты пачками, вернет их число."""
+    batch, total = [], 0
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+            batch = []
+    if batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+        total += len(batch)
+    return total
+
+
+def catch_up(user_id, author_ids):
+    """Догружает в ленту все новые посты авторов из `pull_author_ids()`.
+
+    Отметка у каждого автора своя — последний id его поста в ленте
+    читателя, поэтому догружаются и посты с явной датой старше уже
+    прочитанных. Посты идут пачками по `TIMELINE_BATCH_SIZE`, без
+    общего лимита.
+    """
+    last_ids = dict(
+        Timeline.objects
+        .filter(user_id=user_id, author_id__in=author_ids)
+        .values_list('author_id')
+        .annotate(last_id=Max('post_id'))
+    )
+    added = 0
+    for author_id in author_ids:
+        posts = (
+            Post.objects
+            .filter(author_id=author_id, pk__gt=last_ids.get(author_id, 0))
+            .values_list('pk', 'pub_date')
+            .iterator()
+        )
+        added += _bulk_insert(
+            Timeline(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts
+        )
+    if added:
+        # Закэшированная страница ленты не знает о догруженных постах.
+        bump_version(follow_scope(user_id))
+
+
+def schedule_catch_up(user_id, author_ids):
+    """Ставит `catch_up()` в фоновый поток, не чаще интервала.
+
+    Запрос ленты ничего не пишет в базу: догруженные посты появятся
+    на следующей странице, кэш которой сбросит смена версии ленты.
+    Без `TIMELINE_ASYNC` догрузка идет сразу, в текущем потоке.
+    """
+    key = CAUGHT_UP_KEY.format(user_id)
+    if not cache.add(key, True, settings.TIMELINE_CATCH_UP_INTERVAL):
+        return
+    if settings.TIMELINE_ASYNC:
+        submit(catch_up, user_id, author_ids, pool='timeline',
+               workers=settings.TIMELINE_WORKERS)
+    else:
+        catch_up(user_id, author_ids)
+
+
+def follow_feed(user):
+    """Посты авторов, на которых подписан пользователь.
+
+    Это всегда один проход по индексу ленты: посты авторов из
+    `pull_author_ids()` догружаются в нее `schedule_catch_up()`. Дата
+    поста отдается в аннотации `feed_date`, по ней лента сортируется и
+    листается курсором.
+    """
+    pull_ids = list(
+        Follow.objects
+        .filter(user=user, author_id__in=pull_author_ids())
+        .values_list('author_id', flat=True)
+    )
+    if pull_ids:
+        schedule_catch_up(user.pk, pull_ids)
+    return (
+        Post.objects
+        .select_related('author', 'group')
+        .filter(timeline_entries__user=user)
+        .annotate(feed_date=F('timeline_entries__pub_date'))
+        .order_by('-feed_date', '-pk')
+    )
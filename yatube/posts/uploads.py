@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps
+
+# Форматы, которые умеем уменьшать без потери анимации и прозрачности.
+DOWNSAMPLE_FORMATS = ('JPEG', 'PNG', 'WEBP')
+# Форматы, которые Pillow умеет декодировать сразу в уменьшенном масштабе.
+DRAFT_FORMATS = ('JPEG',)
+
+
+def check_image(upload):
+    """Проверяет размер файла и картинки по заголовку.
+
+    Django уже открыл картинку в `ImageField` и положил ее в
+    `upload.image`; Pillow к этому моменту прочитал только заголовок,
+    поэтому проверка не требует памяти под пиксели. Форматы без
+    `draft()` декодируются целиком, для них лимит пикселей строже.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='file_too_large',
+            params={'limit': settings.POST_IMAGE_MAX_SIZE // 2 ** 20},
+        )
+    width, height = upload.image.size
+    limit = (
+        settings.POST_IMAGE_MAX_PIXELS
+        if upload.image.format in DRAFT_FORMATS
+        else settings.POST_IMAGE_MAX_DECODE_PIXELS
+    )
+    if width * height > limit:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': limit // 10 ** 6},
+        )
+
+
+def downsample_image(upload):
+    """Уменьшает слишком большую картинку до `POST_IMAGE_MAX_SIDE`.
+
+    JPEG декодируется сразу в уменьшенном масштабе через `draft()`,
+    так что полного буфера пикселей в памяти не бывает. Остальные
+    форматы декодируются целиком, но их размер уже ограничен
+    `POST_IMAGE_MAX_DECODE_PIXELS`. Поворот из EXIF применяется к
+    пикселям: при пересохранении EXIF не сохраняется.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    width, height = upload.image.size
+    format_ = upload.image.format
+    if max(width, height) <= max_side or format_ not in DOWNSAMPLE_FORMATS:
+        return upload
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image.draft(image.mode, (max_side, max_side))
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+        result = TemporaryUploadedFile(
+            name=upload.name,
+            content_type=upload.content_type,
+            size=0,
+            charset=None,
+        )
+        image.save(result, format_, quality=settings.POST_IMAGE_QUALITY)
+    result.size = result.tell()
+    result.seek(0)
+    result.image = image
+    return result
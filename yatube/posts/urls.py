@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -22,6 +22,29 @@ urlpatterns = [
         'posts/<int:post_id>/comment/',
         views.add_comment, name='add_comment'
     ),
+    # Подгрузка комментариев к записи.
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comments, name='comments'
+    ),
+    # Полнотекстовый поиск по постам.
+    path('search/', views.search, name='search'),
+    # JSON API лент и постов, только чтение.
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path(
+        'api/profile/<str:username>/', api.profile, name='api_profile'
+    ),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
+    path(
+        'api/posts/<int:post_id>/', api.post_detail, name='api_post_detail'
+    ),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.comments, name='api_comments'
+    ),
+    # Потоковая выгрузка постов и комментариев.
+    path('export/<str:record_type>/', views.export, name='export'),
     # Список постов только авторов на которых мы подписаны.
     path('follow/', views.follow_index, name='follow_index'),
     # Подписка на автора.
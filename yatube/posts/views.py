@@ -1,14 +1,80 @@
+import re
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import patch_vary_headers
+from django.utils.http import urlencode
+from django.utils.text import compress_sequence
+
+from core.db.routers import read_replica
 
-from .addons import paginator
+from . import comment_queue
+from .addons import comment_page, paginator
+from .caching import (IMAGES_SCOPE, POST_AUTHOR_KEY, POSTS_SCOPE,
+                      author_scope, cached_page, feed_version, follow_scope,
+                      group_scope, post_scope)
+from .counters import counters_for
+from .exporter import (EXPORT_FORMATS, EXPORT_MODELS, export_lines,
+                       export_queryset)
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post, User
+from .search import get_backend
+from .thumbnails import schedule_thumbnails
+from .timeline import follow_feed
 
 # Numbers of title length
 TITLE_LENGTH: int = 30
 
+# Вес кодировки в `Accept-Encoding`: `gzip;q=0` — отказ от gzip.
+QVALUE = re.compile(r'\bq\s*=\s*([\d.]+)')
+
+
+def accepts_encoding(request, coding):
+    """Принимает ли клиент кодировку `coding` с ненулевым весом."""
+    weights = {}
+    accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for part in accept.split(','):
+        name, _, params = part.partition(';')
+        match = QVALUE.search(params)
+        try:
+            weight = float(match.group(1)) if match else 1.0
+        except ValueError:
+            weight = 0.0
+        weights[name.strip().lower()] = weight
+    return weights.get(coding, weights.get('*', 0.0)) > 0
+
+
+def index_scopes(request):
+    return (POSTS_SCOPE,)
+
+
+def group_scopes(request, slug):
+    return (group_scope(slug),)
+
+
+def profile_scopes(request, username):
+    return (author_scope(username),)
+
+
+def post_scopes(request, post_id):
+    # На странице поста есть счетчик постов автора, а автора без
+    # запроса к базе знаем, только если страница уже показывалась.
+    author = cache.get(POST_AUTHOR_KEY.format(post_id))
+    if author is None:
+        return None
+    return (post_scope(post_id), author_scope(author))
+
 
+def comments_scopes(request, post_id):
+    return (post_scope(post_id),)
+
+
+@cached_page(index_scopes)
+@read_replica
 def index(request):
     template = 'posts/index.html'
     title = "Последние обновления на сайте"
@@ -17,10 +83,14 @@ def index(request):
     context = {
         'title': title,
         'page_obj': page_obj,
+        'feed_version': feed_version(POSTS_SCOPE, IMAGES_SCOPE),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@cached_page(group_scopes)
+@read_replica
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     template = 'posts/group_list.html'
@@ -33,9 +103,13 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@cached_page(profile_scopes)
+@read_replica
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
     title = f'Профайл пользователя { author.get_full_name() }'
     posts = (
         Post
@@ -43,7 +117,8 @@ def profile(request, username):
         .select_related('author', 'group')
         .filter(author=author)
     )
-    count = posts.count()
+    author_counters = counters_for(author)
+    count = author_counters.posts_count
     page_obj = paginator(request, posts)
     if request.user.is_authenticated:
         following = (
@@ -63,34 +138,78 @@ def profile(request, username):
         'title': title,
         'page_obj': page_obj,
         'count': count,
+        'counters': author_counters,
         'following': following,
         'user_not_author': user_not_author,
     }
     return render(request, template, context)
 
 
+@cached_page(post_scopes)
+@read_replica
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = Post.objects.get(pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id,
+    )
+    cache.add(POST_AUTHOR_KEY.format(post_id), post.author.username, None)
     title = post.text[:TITLE_LENGTH]
-    count = Post.objects.filter(author=post.author).count()
+    count = counters_for(post.author).posts_count
     form = CommentForm()
-    comments = Comment.objects.select_related('author').filter(post=post.id)
+    # Комментарии идут страницами от старых к новым: страница поста
+    # не растет с их числом, остальные подгружаются из `comments`.
+    comments = comment_page(
+        Comment.objects.select_related('author').filter(post=post.id),
+        request.GET.get('cursor'),
+    )
+    pending_comments = []
+    if settings.COMMENT_WRITE_BEHIND and request.user.is_authenticated:
+        # Свои комментарии из очереди автор видит до переноса в базу.
+        pending_comments = comment_queue.pending(post_id, request.user)
     context = {
         'post_id': post_id,
         'post': post,
         'count': count,
         'title': title,
         'comments': comments,
+        'pending_comments': pending_comments,
         'form': form,
     }
     return render(request, template, context)
 
 
+@cached_page(comments_scopes)
+@read_replica
+def comments(request, post_id):
+    """Следующая страница комментариев поста HTML-фрагментом."""
+    page = comment_page(
+        Comment.objects.select_related('author').filter(post=post_id),
+        request.GET.get('cursor'),
+    )
+    if not page and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': page,
+    }
+    return render(request, 'includes/comments.html', context)
+
+
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
+    if settings.COMMENT_WRITE_BEHIND:
+        # Пост, чья страница уже показывалась, есть в кэше: база не
+        # нужна. Комментарии к удаленным постам отбросит перенос.
+        if cache.get(POST_AUTHOR_KEY.format(post_id)) is None:
+            get_object_or_404(Post, id=post_id)
+        if form.is_valid():
+            comment_queue.enqueue(
+                post_id, request.user.pk, form.cleaned_data['text']
+            )
+        return redirect('posts:post_detail', post_id=post_id)
+    post = get_object_or_404(Post, id=post_id)
     if form.is_valid():
         form.instance.author = request.user
         form.instance.post = post
@@ -111,7 +230,10 @@ def post_create(request):
         group = form.cleaned_data['group']
         image = form.cleaned_data['image']
         author = request.user
-        Post.objects.create(text=text, author=author, group=group, image=image)
+        post = Post.objects.create(
+            text=text, author=author, group=group, image=image
+        )
+        schedule_thumbnails(post.image)
         return redirect('posts:profile', username=request.user)
     context = {
         'form': form,
@@ -122,7 +244,9 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
     template = 'posts/create_post.html'
     if post.author != request.user:
         return redirect('posts:post_detail', post_id=post_id)
@@ -134,7 +258,9 @@ def post_edit(request, post_id):
         files=request.FILES or None,
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnails(post.image)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'title': title,
@@ -145,14 +271,21 @@ def post_edit(request, post_id):
 
 
 @login_required
+@read_replica
 def follow_index(request):
     template = 'posts/follow.html'
     title = "Последние обновления авторов"
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(request, posts)
+    # Версия читается до ленты: она решает, можно ли читать с реплики.
+    version = feed_version(
+        POSTS_SCOPE, follow_scope(request.user.pk), IMAGES_SCOPE
+    )
+    posts = follow_feed(request.user)
+    page_obj = paginator(request, posts, ordering='-feed_date')
     context = {
         'title': title,
         'page_obj': page_obj,
+        'feed_version': version,
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
@@ -162,9 +295,8 @@ def profile_follow(request, username):
     # Подписаться на автора
     user = request.user
     author = get_object_or_404(User, username=username)
-    follower_count = Follow.objects.filter(user=user, author=author).count()
-    if user != author and follower_count == 0:
-        Follow.objects.create(user=user, author=author)
+    if user != author:
+        Follow.objects.get_or_create(user=user, author=author)
     return redirect('posts:profile', username=author)
 
 
@@ -176,3 +308,60 @@ def profile_unfollow(request, username):
     if follower.exists():
         follower.delete()
     return redirect('posts:profile', username=author)
+
+
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    title = f'Поиск: {query}' if query else 'Поиск'
+    page_obj = None
+    if query:
+        # Результаты идут по релевантности, курсор по дате к ним не
+        # подходит, поэтому листаем по номеру страницы.
+        posts = get_backend().search(query)
+        page_obj = Paginator(posts, settings.POSTS_ON_PAGE).get_page(
+            request.GET.get('page')
+        )
+    context = {
+        'title': title,
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&' if query else '',
+    }
+    return render(request, template, context)
+
+
+@login_required
+def export(request, record_type):
+    """Потоковая выгрузка постов или комментариев в NDJSON или CSV.
+
+    Пользователь выгружает свои записи, персонал с `?all=1` — все.
+    Если клиент принимает gzip, ответ сжимается на лету.
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if record_type not in EXPORT_MODELS or export_format not in (
+        EXPORT_FORMATS
+    ):
+        raise Http404
+    author = request.user
+    if request.GET.get('all') and request.user.is_staff:
+        author = None
+    lines = (
+        line.encode() for line in export_lines(
+            record_type, export_format, export_queryset(record_type, author)
+        )
+    )
+    gzipped = accepts_encoding(request, 'gzip')
+    response = StreamingHttpResponse(
+        compress_sequence(lines) if gzipped else lines,
+        content_type=(
+            'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        ) + '; charset=utf-8',
+    )
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response['Content-Disposition'] = (
+        f'attachment; filename="{record_type}s.{export_format}"'
+    )
+    return response
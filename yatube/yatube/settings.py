@@ -59,6 +59,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,18 +96,98 @@ TEMPLATES = [
     },
 ]
 
+# Боевой режим шаблонов: загрузчик с кэшем скомпилированных шаблонов,
+# которые компилируются заранее, при старте воркера (yatube/wsgi.py).
+# При DEBUG выключен, чтобы правки шаблонов были видны сразу.
+TEMPLATE_CACHE: bool = (
+    os.getenv('TEMPLATE_CACHE', '0' if DEBUG else '1') == '1'
+)
+if TEMPLATE_CACHE:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Тесты идут с синхронными фоновыми задачами, см. core/test_runner.py.
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# В бою база — PostgreSQL, она включается переменной окружения
+# POSTGRES_DB; без нее используется SQLite.
+# Пул соединений: размеры, таймаут ожидания, возраст соединения и
+# проверка `SELECT 1` при выдаче. Включается переменной DB_POOL=1.
+DB_POOL: bool = os.getenv('DB_POOL', '0') == '1'
+DB_POOL_OPTIONS = {
+    'POOL_MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+    'POOL_MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    'POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', '5')),
+    'POOL_MAX_AGE': float(os.getenv('DB_POOL_MAX_AGE', '600')),
+    'POOL_CHECK': True,
+}
+
+if os.getenv('POSTGRES_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': (
+                'core.db.backends.postgresql' if DB_POOL
+                else 'django.db.backends.postgresql'
+            ),
+            'NAME': os.getenv('POSTGRES_DB'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'OPTIONS': DB_POOL_OPTIONS if DB_POOL else {},
+        }
+    }
+    # Реплики только для чтения: хосты через запятую.
+    for number, host in enumerate(
+        filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',')),
+        start=1,
+    ):
+        DATABASES[f'replica{number}'] = {
+            **DATABASES['default'],
+            'HOST': host.strip(),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': (
+                'core.db.backends.sqlite3' if DB_POOL
+                else 'django.db.backends.sqlite3'
+            ),
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            'OPTIONS': DB_POOL_OPTIONS if DB_POOL else {},
+        }
+    }
+    # База-заглушка реплики для тестов маршрутизации. В
+    # REPLICA_DATABASES она не входит, тесты включают ее сами.
+    DATABASES['replica'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
     }
-}
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+# Реплики, на которые уходят чтения из view с `read_replica`.
+REPLICA_DATABASES = [
+    alias for alias in DATABASES
+    if alias.startswith('replica') and alias != 'replica'
+]
+# Реплика, отставшая больше чем на столько секунд, не используется;
+# отставание проверяется не чаще раза в REPLICA_LAG_CHECK_INTERVAL.
+REPLICA_MAX_LAG: float = 2.0
+REPLICA_LAG_CHECK_INTERVAL: float = 1.0
+# После записи чтения клиента идут на основную базу столько секунд.
+REPLICA_PIN_COOKIE: str = 'pin_primary'
+REPLICA_PIN_SECONDS: int = 5
 
 
 # Password validation
@@ -156,11 +238,132 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # Numbers of posts shown on page
 POSTS_ON_PAGE: int = 10
-
+# Комментариев на странице поста и в одной подгрузке.
+COMMENTS_ON_PAGE: int = 20
+# Комментарии сначала пишутся в локальную очередь (SQLite в режиме WAL),
+# а в базу переносятся пачками. Выключено по умолчанию.
+COMMENT_WRITE_BEHIND: bool = os.getenv('COMMENT_WRITE_BEHIND', '0') == '1'
+COMMENT_QUEUE_PATH: str = os.getenv(
+    'COMMENT_QUEUE_PATH', os.path.join(BASE_DIR, 'comment_queue.sqlite3')
+)
+# Переносить очередь фоновым потоком; без него очередь разбирается
+# командой flush_comments.
+COMMENT_FLUSH_ASYNC: bool = os.getenv('COMMENT_FLUSH_ASYNC', '1') == '1'
+
+# Как часто переносить очередь, в секундах, и сколько комментариев за раз.
+COMMENT_FLUSH_INTERVAL: float = 0.5
+COMMENT_FLUSH_BATCH: int = 500
+# Через сколько секунд пачку, взятую упавшим процессом, забирает другой.
+COMMENT_CLAIM_TIMEOUT: int = 300
+
+# Кэш двухуровневый: небольшой LRU в процессе перед общим кэшем.
+# В продакшене общий кэш задается через CACHE_BACKEND и CACHE_LOCATION
+# (например, memcached), локально его заменяет LocMemCache. LocMemCache
+# не общий между процессами, поэтому без DEBUG проверка core.W001
+# предупреждает о нем при запуске.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 60,
+            'STAMP_INTERVAL': 1,
+        },
+    },
+    'shared': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
 }
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Лента подписок: авторы, у которых подписчиков не меньше лимита,
+# не раскладываются по лентам, их посты догружаются при чтении.
+TIMELINE_FANOUT_LIMIT: int = 1000
+# Сколько последних постов автора добавить в ленту после подписки.
+TIMELINE_BACKFILL: int = 200
+# Размер пачки вставки записей ленты.
+TIMELINE_BATCH_SIZE: int = 500
+# Сколько секунд хранить в кэше список авторов с чтением по запросу.
+TIMELINE_PULL_AUTHORS_TTL: int = 300
+# Как часто догружать в ленту посты популярных авторов, в секундах.
+TIMELINE_CATCH_UP_INTERVAL: int = 60
+# Догружать ленту в фоновых потоках, а не в запросе, и число потоков.
+TIMELINE_ASYNC: bool = os.getenv('TIMELINE_ASYNC', '1') == '1'
+TIMELINE_WORKERS: int = 1
+
+# Сколько секунд хранить фрагменты лент. Кэш сбрасывается сигналами
+# при изменении постов, групп и подписок.
+FEED_CACHE_TIMEOUT: int = 300
+# Сколько секунд хранить целые страницы для анонимов в кэше и в CDN
+# (s-maxage). Страницы сбрасываются сменой версий, как и фрагменты.
+# 0 выключает кэш страниц.
+PAGE_CACHE_TIMEOUT: int = 300
+# Сколько секунд хранить готовый HTML поста. Ключ меняется с ревизией
+# поста, так что срок нужен только чтобы вытеснять забытые версии.
+ARTICLE_CACHE_TIMEOUT: int = 60 * 60 * 24
+# Сколько готовых адресов с параметрами помнить `post_url`.
+POST_URL_CACHE_SIZE: int = 4096
+
+# Варианты картинок постов: ширины, пропорции и форматы по убыванию
+# предпочтения. Форматы, которые не умеет сохранять Pillow, пропускаются.
+POST_IMAGE_WIDTHS = (320, 640, 960, 1920)
+POST_IMAGE_RATIO: float = 960 / 339
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+# Вариант для `src` у браузеров без поддержки `srcset`.
+POST_IMAGE_FALLBACK = ('JPEG', 960)
+POST_IMAGE_SIZES: str = '(max-width: 992px) 100vw, 960px'
+# Создавать миниатюры в фоновых потоках, а не в запросе.
+THUMBNAIL_ASYNC: bool = os.getenv('THUMBNAIL_ASYNC', '1') == '1'
+# Число потоков, создающих миниатюры.
+THUMBNAIL_WORKERS: int = 2
+
+# Загрузки пишутся во временный файл, а не держатся в памяти.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# Ограничения на картинки постов: размер файла, число пикселей и
+# сторона, до которой уменьшаются слишком большие оригиналы. Форматы,
+# которые декодируются только целиком (PNG, WebP), ограничены строже.
+POST_IMAGE_MAX_SIZE: int = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS: int = 40 * 10 ** 6
+POST_IMAGE_MAX_DECODE_PIXELS: int = 16 * 10 ** 6
+POST_IMAGE_MAX_SIDE: int = 3840
+POST_IMAGE_QUALITY: int = 90
+
+# Доля запросов, которые замеряет PerformanceMiddleware, от 0 до 1.
+PERF_SAMPLE_RATE: float = float(
+    os.getenv('PERF_SAMPLE_RATE', '0.01')
+)
+# Отдавать ли метрики замеренных запросов в заголовке Server-Timing.
+# Даже включенный, заголовок получают только сотрудники и INTERNAL_IPS.
+PERF_SERVER_TIMING: bool = os.getenv('PERF_SERVER_TIMING', '0') == '1'
+
+# Статистический профайлер воркеров на странице /admin/profiler/.
+PROFILER_ENABLED: bool = os.getenv('PROFILER_ENABLED', '0') == '1'
+# Интервал выборки стеков и предельная доля времени на нее.
+PROFILER_INTERVAL: float = 0.005
+PROFILER_MAX_OVERHEAD: float = 0.02
+# Самое долгое окно профилирования в секундах.
+PROFILER_MAX_DURATION: float = 300
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.perf': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -14,3 +14,15 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from core.template_cache import warm_templates  # noqa: E402
+
+warm_templates()
+
+if settings.COMMENT_WRITE_BEHIND:
+    from posts.comment_queue import start_flusher
+
+    # Переносим остатки очереди, не дожидаясь нового комментария.
+    start_flusher()